@@ -14,6 +14,9 @@ import asyncio
 import logging
 from datetime import datetime
 from typing import Dict, List, Any, Optional
+
+import numpy as np
+
 from data_provider import DataProvider
 
 logger = logging.getLogger(__name__)
@@ -30,15 +33,15 @@ class CEXAnalyzer:
     """
     
     # 穩定幣清單
-    STABLECOINS = {
+    STABLECOINS = frozenset({
         'USDT', 'USDC', 'DAI', 'FDUSD', 'TUSD', 'BUSD', 'USDD',
         'PYUSD', 'GUSD', 'LUSD', 'FRAX', 'USDP', 'USDE', 'CRVUSD'
-    }
+    })
     
     # 主要資產 (BTC/ETH 相關)
-    MAJOR_ASSETS = {
+    MAJOR_ASSETS = frozenset({
         'BTC', 'ETH', 'WBTC', 'WETH', 'STETH', 'RETH', 'CBETH', 'WSTETH'
-    }
+    })
     
     # 預設分析的交易所
     DEFAULT_EXCHANGES = [
@@ -124,7 +127,9 @@ class CEXAnalyzer:
             current_tokens = current.get('tokens', {})
             previous_tokens = previous.get('tokens', {})
             
-            current_total = sum(current_tokens.values())
+            # 當前資產值一次轉為陣列，總額與穩定幣小計共用
+            current_values = np.fromiter(current_tokens.values(), dtype=np.float64, count=len(current_tokens))
+            current_total = float(current_values.sum())
             previous_total = sum(previous_tokens.values())
             
             result['total_tvl'] = current_total
@@ -145,8 +150,10 @@ class CEXAnalyzer:
             result['btc_eth_flow_4h'] = result['btc_eth_flow_24h'] * 0.25
             
             # 計算穩定幣佔比
-            stable_total = sum(v for k, v in current_tokens.items() 
-                              if self._is_stablecoin(k))
+            stable_mask = np.fromiter(
+                (self._is_stablecoin(k) for k in current_tokens), dtype=bool, count=len(current_tokens)
+            )
+            stable_total = float(current_values[stable_mask].sum())
             result['stablecoin_pct'] = (stable_total / current_total * 100) if current_total > 0 else 0
             
             # 計算數據可信度
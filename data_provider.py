@@ -19,6 +19,9 @@ Usage:
 import asyncio
 import aiohttp
 import logging
+
+import disk_cache
+from http_client import acquire_session, release_session
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
@@ -31,7 +34,7 @@ class DataProvider:
     集中化的 API 數據獲取器
     
     特點：
-    - 單一 Session 管理
+    - 共用 Session 管理 (見 http_client)
     - HTTP 429 (Rate Limit) 指數退避處理
     - 支援 Retry-After header
     - 所有 API 端點集中管理
@@ -58,6 +61,13 @@ class DataProvider:
         'funding_rates': '/fapi/v1/premiumIndex',           # 資金費率
     }
     
+    # /protocols 變動緩慢 (分鐘級)，磁碟快取秒數 (與測試腳本共用)
+    PROTOCOLS_CACHE_TTL = 300
+    # 其他慢變端點的磁碟快取秒數 (依來源更新頻率)
+    STABLECOINS_CACHE_TTL = 600     # 穩定幣市值約每小時更新
+    DERIVATIVES_CACHE_TTL = 60      # 資金費率 / OI
+    FEAR_GREED_CACHE_TTL = 3600     # 恐慌貪婪指數每日更新
+    
     # 預設請求 Headers (模擬瀏覽器避免被攔截)
     DEFAULT_HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -73,20 +83,18 @@ class DataProvider:
         """
         self._session: Optional[aiohttp.ClientSession] = None
         self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self.cache_hits: Dict[str, bool] = {}  # 快取鍵 -> 本次是否命中磁碟快取
     
     async def __aenter__(self):
-        """Context manager 入口 - 建立 Session"""
-        self._session = aiohttp.ClientSession(
-            timeout=self._timeout,
-            headers=self.DEFAULT_HEADERS
-        )
+        """Context manager 入口 - 取得共用 Session (連線池跨實例重用)"""
+        self._session = await acquire_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Context manager 出口 - 關閉 Session"""
-        if self._session:
-            await self._session.close()
+        """Context manager 出口 - 釋放共用 Session (最後一個持有者離開時關閉)"""
+        if self._session is not None:
             self._session = None
+            await release_session()
     
     @property
     def session(self) -> aiohttp.ClientSession:
@@ -124,7 +132,8 @@ class DataProvider:
         """
         for attempt in range(retries):
             try:
-                async with self.session.get(url, params=params) as response:
+                async with self.session.get(url, params=params, headers=self.DEFAULT_HEADERS,
+                                            timeout=self._timeout) as response:
                     if response.status == 200:
                         return await response.json()
                     
@@ -172,17 +181,29 @@ class DataProvider:
         logger.error(f"❌ 請求失敗 (已重試 {retries} 次): {url[-80:]}")
         return None
     
+    def _load_cached(self, key: str, ttl: float) -> Optional[Any]:
+        """讀取磁碟快取並記錄命中與否 (供報告 meta 觀察)"""
+        data = disk_cache.load_json(key, ttl=ttl)
+        self.cache_hits[key] = data is not None
+        return data
+    
     # ================= DefiLlama API 方法 =================
     
     async def get_protocols(self) -> Optional[List[Dict]]:
         """
-        獲取所有協議列表
+        獲取所有協議列表 (PROTOCOLS_CACHE_TTL 內直接讀磁碟快取)
         
         Returns:
             協議列表 (包含 TVL, change_1d, change_7d 等資訊)
         """
+        cached = self._load_cached('protocols', self.PROTOCOLS_CACHE_TTL)
+        if cached is not None:
+            return cached
         url = f"{self.DEFILLAMA_BASE}{self.ENDPOINTS['protocols']}"
-        return await self.fetch_with_retry(url)
+        data = await self.fetch_with_retry(url)
+        if data is not None:
+            disk_cache.store_json('protocols', data)
+        return data
     
     async def get_protocol_detail(self, slug: str) -> Optional[Dict]:
         """
@@ -226,13 +247,19 @@ class DataProvider:
     
     async def get_stablecoins(self) -> Optional[Dict]:
         """
-        獲取穩定幣流通量數據
+        獲取穩定幣流通量數據 (STABLECOINS_CACHE_TTL 內直接讀磁碟快取)
         
         Returns:
             穩定幣數據 (包含 peggedAssets 列表)
         """
+        cached = self._load_cached('stablecoins', self.STABLECOINS_CACHE_TTL)
+        if cached is not None:
+            return cached
         url = f"{self.STABLECOINS_BASE}{self.ENDPOINTS['stablecoins']}"
-        return await self.fetch_with_retry(url)
+        data = await self.fetch_with_retry(url)
+        if data is not None:
+            disk_cache.store_json('stablecoins', data)
+        return data
     
     # ================= Binance API 方法 =================
     
@@ -447,13 +474,17 @@ class DataProvider:
     async def get_derivatives_data(self) -> Dict[str, Any]:
         """
         一次性獲取所有衍生品數據 (OI + Funding)
+        (DERIVATIVES_CACHE_TTL 內直接讀磁碟快取)
         """
+        cached = self._load_cached('derivatives', self.DERIVATIVES_CACHE_TTL)
+        if cached is not None:
+            return cached
     
         funding = await self.get_funding_rates()
         btc_oi = await self.get_open_interest('BTCUSDT')
         eth_oi = await self.get_open_interest('ETHUSDT')
         
-        return {
+        data = {
             'funding_rates': funding,
             'open_interest': {
                 'BTC': btc_oi,
@@ -461,23 +492,33 @@ class DataProvider:
             },
             'timestamp': datetime.utcnow().isoformat() + "Z"
         }
+        # 全部來源皆失敗時不寫快取，下次重新抓取
+        if funding or btc_oi or eth_oi:
+            disk_cache.store_json('derivatives', data)
+        return data
 
     async def fetch_fear_greed_index(self) -> Dict[str, Any]:
         """
         獲取加密貨幣貪婪恐慌指數
         Returns: {'value': 50, 'value_classification': 'Neutral'}
+        (FEAR_GREED_CACHE_TTL 內直接讀磁碟快取)
         """
+        cached = self._load_cached('fear_greed', self.FEAR_GREED_CACHE_TTL)
+        if cached is not None:
+            return cached
         try:
             url = f"{self.FEAR_GREED_BASE}/fng/"
             data = await self.fetch_with_retry(url)
             
             if data and data.get('data'):
                 latest = data['data'][0]
-                return {
+                result = {
                     'value': int(latest.get('value', 50)),
                     'value_classification': latest.get('value_classification', 'Neutral'),
                     'timestamp': latest.get('timestamp')
                 }
+                disk_cache.store_json('fear_greed', result)
+                return result
             return {'value': 50, 'value_classification': 'Neutral'}
         except Exception as e:
             logger.error(f"Error fetching Fear & Greed Index: {e}")
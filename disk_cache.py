@@ -0,0 +1,102 @@
+"""
+💾 Disk Cache - 跨程序共用的檔案 TTL 快取 v1.0
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+功能特色：
+- 每個鍵一個檔案，以檔案 mtime 判斷是否過期 (不需額外索引)
+- 先寫暫存檔再原子替換，並行讀取不會讀到半寫入內容
+- 管道與測試腳本共用同一個快取目錄
+
+Usage:
+    import disk_cache
+
+    data = disk_cache.load_json('protocols', ttl=300)
+    if data is None:
+        data = fetch(...)
+        disk_cache.store_json('protocols', data)
+"""
+
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional
+
+from json_codec import dumps_compact as _json_dumps, loads as _json_loads
+
+logger = logging.getLogger(__name__)
+
+# 快取目錄 (可用環境變數 CEXDEX_CACHE_DIR 覆寫)
+CACHE_DIR = Path(os.environ.get('CEXDEX_CACHE_DIR') or Path(tempfile.gettempdir()) / 'cexdex_cache')
+
+
+def _path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.json"
+
+
+def load_bytes(key: str, ttl: float) -> Optional[bytes]:
+    """
+    讀取快取原始內容
+
+    Returns:
+        未過期時回傳內容，不存在或超過 ttl 秒則回傳 None
+    """
+    path = _path(key)
+    try:
+        if time.time() - path.stat().st_mtime >= ttl:
+            return None
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"⚠️ 讀取快取失敗 [{key}]: {e}")
+        return None
+
+
+def store_bytes(key: str, payload: bytes):
+    """寫入快取原始內容 (失敗只記錄警告，不影響呼叫端)"""
+    path = _path(key)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_file.write_bytes(payload)
+        os.replace(tmp_file, path)
+    except OSError as e:
+        logger.warning(f"⚠️ 寫入快取失敗 [{key}]: {e}")
+
+
+@contextmanager
+def open_writer(key: str) -> Iterator[BinaryIO]:
+    """
+    以串流方式寫入快取原始內容 (逐塊寫入暫存檔，區塊正常結束才原子替換)
+
+    區塊內拋出例外時丟棄暫存檔，不留下半份快取；
+    與 store_bytes 不同，寫入失敗的 OSError 會交由呼叫端處理
+    """
+    path = _path(key)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, 'wb') as f:
+            yield f
+        os.replace(tmp_file, path)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+
+def load_json(key: str, ttl: float) -> Optional[Any]:
+    """讀取並解析 JSON 快取 (未命中或內容損毀時回傳 None)"""
+    payload = load_bytes(key, ttl)
+    if payload is None:
+        return None
+    try:
+        return _json_loads(payload)
+    except ValueError:
+        return None
+
+
+def store_json(key: str, data: Any):
+    """序列化並寫入 JSON 快取"""
+    store_bytes(key, _json_dumps(data))
@@ -0,0 +1,123 @@
+"""
+🌐 HTTP Client - 共用 aiohttp Session v1.0
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+功能特色：
+- 模組層級單例 Session，管道與測試腳本共用同一個連線池
+- Keep-alive 連線重用 + DNS 快取，省去重複的 TCP/TLS 握手
+- Session 綁定建立時的事件迴圈；換了迴圈 (例如再次 asyncio.run) 會自動重建
+- 持有者計數：最後一個 release_session() 時自動關閉
+- 程序結束時由 atexit 補關仍開啟的 Session
+
+Usage:
+    from http_client import acquire_session, release_session
+
+    session = await acquire_session()
+    try:
+        async with session.get(url) as response:
+            data = await response.json()
+    finally:
+        await release_session()
+"""
+
+import asyncio
+import atexit
+import logging
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# 連線池設定
+CONNECTION_LIMIT = 100
+DNS_CACHE_TTL = 300        # 秒
+KEEPALIVE_TIMEOUT = 60     # 秒
+DEFAULT_TIMEOUT = 30       # 秒 (單次請求可另外覆寫)
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_holders = 0  # acquire_session() 尚未 release 的持有者數
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    取得共用的 aiohttp Session (不存在、已關閉或屬於其他事件迴圈時重新建立)
+
+    呼叫端不應自行關閉；需要自動關閉時改用 acquire_session() / release_session()，
+    否則結束時呼叫 close_session()
+    """
+    global _session, _session_loop, _holders
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        stale = _session
+        _holders = 0
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT),
+        )
+        _session_loop = loop
+        # 舊 Session 屬於其他 (通常已結束的) 事件迴圈：新 Session 就位後再關閉，
+        # 關閉期間並行呼叫者拿到的都是同一個新 Session
+        await _close_quietly(stale)
+    return _session
+
+
+async def acquire_session() -> aiohttp.ClientSession:
+    """取得共用 Session 並登記一個持有者 (須與 release_session() 成對呼叫)"""
+    global _holders
+    session = await get_session()
+    _holders += 1
+    return session
+
+
+async def release_session():
+    """釋放一個持有者；最後一個持有者離開時關閉共用 Session"""
+    global _holders
+    _holders = max(0, _holders - 1)
+    if _holders == 0:
+        await close_session()
+
+
+async def close_session():
+    """關閉共用 Session (不論持有者數)"""
+    global _holders
+    _holders = 0
+    await _discard_session()
+
+
+async def _discard_session():
+    """關閉並清除目前的 Session"""
+    global _session, _session_loop
+    session, _session, _session_loop = _session, None, None
+    await _close_quietly(session)
+
+
+async def _close_quietly(session: Optional[aiohttp.ClientSession]):
+    """關閉 Session；失敗只記錄，不影響呼叫端"""
+    if session is None or session.closed:
+        return
+    try:
+        await session.close()
+    except Exception as e:
+        logger.debug(f"關閉共用 Session 失敗: {e}")
+
+
+def _close_at_exit():
+    """atexit 補救：關閉仍開啟的 Session (原事件迴圈已關閉時改用新迴圈)"""
+    if _session is None or _session.closed:
+        return
+    loop = _session_loop
+    try:
+        if loop is not None and not loop.is_closed() and not loop.is_running():
+            loop.run_until_complete(close_session())
+        else:
+            asyncio.run(close_session())
+    except Exception as e:
+        logger.debug(f"關閉共用 Session 失敗: {e}")
+
+
+atexit.register(_close_at_exit)
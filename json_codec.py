@@ -0,0 +1,34 @@
+"""
+🧾 JSON Codec - 共用 JSON 編解碼 v1.0
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+功能特色：
+- 全專案統一使用 orjson (requirements.txt 必裝)，輸出 bytes 可直接 write_bytes
+- dumps: 縮排 2 格，用於 data.json / 狀態檔等需人工檢視的檔案
+- dumps_compact: 無空白，用於快取、指紋與串流輸出
+- 非字串鍵 (int 等) 自動轉為字串，與標準庫 json 行為一致
+
+Usage:
+    from json_codec import dumps, loads
+
+    path.write_bytes(dumps(state))
+    state = loads(path.read_bytes())
+"""
+
+from typing import Any
+
+import orjson
+
+_PRETTY = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+_COMPACT = orjson.OPT_NON_STR_KEYS
+
+loads = orjson.loads
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化為縮排 2 格的 UTF-8 JSON"""
+    return orjson.dumps(obj, option=_PRETTY)
+
+
+def dumps_compact(obj: Any) -> bytes:
+    """序列化為無空白的 UTF-8 JSON"""
+    return orjson.dumps(obj, option=_COMPACT)
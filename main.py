@@ -13,18 +13,31 @@
 """
 
 import asyncio
-import json
-import csv
 import logging
+import time
+from bisect import bisect_right
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Awaitable, List, Optional, Tuple, TypeVar
+
+import numpy as np
 
 from data_provider import DataProvider
+from http_client import close_session
+from json_codec import dumps as _json_dumps
 from analyzer_chain import ChainAnalyzer
 from analyzer_cex import CEXAnalyzer
 from notification_service import check_and_alert, send_summary_notification
-from report_generator import ReportGenerator
+from report_generator import (
+    ReportGenerator,
+    above,
+    calculate_sentiment_score_batch,
+    SM_THRESHOLDS, SM_SCORES,
+    DERIVS_THRESHOLDS, DERIVS_SCORES,
+    CHAIN_THRESHOLDS, CHAIN_SCORES,
+    MACRO_THRESHOLDS, MACRO_SCORES,
+    SENTIMENT_WEIGHTS,
+)
 from paper_trader import PaperTrader
 from analyzer_social import SocialSentimentAnalyzer 
 from market_agents import HiveMind # V7 Feature
@@ -41,6 +54,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
 # 路徑設定
 BASE_DIR = Path(__file__).parent
 REPORTS_DIR = BASE_DIR / "reports"
@@ -70,12 +85,38 @@ CSV_COLUMNS = [
     'Solana_TVL',
     'Ethereum_TVL'
 ]
+# 行尾沿用 csv.DictWriter 預設的 \r\n，與既有 history.csv 一致
+_HISTORY_LINE_END = '\r\n'
+_HISTORY_HEADER = ','.join(CSV_COLUMNS) + _HISTORY_LINE_END
+# history.csv 是否已有標題行 (None = 尚未檢查；首次追加時 stat 一次，之後不再查詢檔案系統)
+_HEADER_WRITTEN: Optional[bool] = None
+
+# 情緒評分: 因子門檻 / 分數 / 權重沿用 report_generator 的查表 (兩邊不會各自漂移)；
+# 評級門檻與標籤為 main 專屬: <=-60 / <=-20 / <20 / <60 / >=60
+_LABEL_THRESHOLDS = (above(-60), above(-20), 20, 60)
+_SENTIMENT_LABELS = ('Strong Bearish 🩸', 'Bearish 🔴', 'Neutral', 'Bullish 🟢', 'Strong Bullish 🚀')
 
 
 async def run_pipeline() -> Dict[str, Any]:
     """
     執行完整數據管道 (End-to-End Pipeline)
     """
+    alert_tasks: List[asyncio.Task] = []
+    try:
+        return await _run_pipeline(alert_tasks)
+    finally:
+        # 管道中途拋出例外時，已啟動的警報任務仍須等到完成，並記錄其錯誤以免遺失
+        for result in await asyncio.gather(*alert_tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"❌ 背景警報任務失敗: {result}")
+        # 任何階段拋出例外都要關閉共用 Session (須在同一事件迴圈內)
+        await close_session()
+
+
+async def _run_pipeline(alert_tasks: List[asyncio.Task]) -> Dict[str, Any]:
+    """
+    alert_tasks: 背景警報任務登記處 (由 run_pipeline 於結束時統一收尾)
+    """
     start_time = datetime.now()
     logger.info("🚀 啟動資金流向數據管道...")
     
@@ -94,29 +135,25 @@ async def run_pipeline() -> Dict[str, Any]:
     hedge_manager = HedgeManager(state_file=HEDGE_STATE_PATH) # V8 The Shield
     
     async with provider:
-        # 1. 並行獲取數據
+        # 1. 並行獲取數據 (主要分析與輔助數據互不相依，一次 gather)
         logger.info("📊 分析公鏈資金流向...")
-        chain_task = analyzer_chain.analyze_multiple_chains(CHAINS_TO_ANALYZE)
-        
         logger.info("🏦 分析交易所資金流向...")
-        cex_task = analyzer_cex.analyze_multiple_exchanges()
-        
-        # 並行執行主要分析任務
-        chain_data, cex_data = await asyncio.gather(chain_task, cex_task)
-        
-        # 2. 獲取輔助數據
         logger.info("💵 獲取穩定幣市值...")
-        stablecoin_data = await provider.get_stablecoins()
-        if stablecoin_data and 'peggedAssets' in stablecoin_data:
-            stablecoin_marketcap = sum(a.get('circulating', {}).get('peggedUSD', 0) or 0 for a in stablecoin_data['peggedAssets'])
-        else:
-            stablecoin_marketcap = 0
-            
         logger.info("📈 獲取衍生品數據 (Funding/OI)...")
-        derivs_data = await provider.get_derivatives_data() 
-        
         logger.info("😨 獲取恐慌貪婪指數...")
-        fng_data = await provider.fetch_fear_greed_index()
+        chain_data, cex_data, stablecoin_marketcap, derivs_data, fng_data = await asyncio.gather(
+            _logged("公鏈分析", analyzer_chain.analyze_multiple_chains(CHAINS_TO_ANALYZE)),
+            _logged("交易所分析", analyzer_cex.analyze_multiple_exchanges()),
+            _logged("穩定幣市值", _get_stablecoin_marketcap(provider)),
+            _logged("衍生品數據", provider.get_derivatives_data()),
+            _logged("恐慌貪婪指數", provider.fetch_fear_greed_index()),
+        )
+        
+        # 名稱索引 (建立一次，後續 O(1) 查找；不寫回原始數據以免混入 data.json)
+        chain_by_name = {c.get('chain'): c for c in chain_data.get('chains', [])}
+        cex_by_name = {}
+        for e in cex_data.get('exchanges', []):
+            cex_by_name.setdefault(e.get('exchange'), e)
 
         # 3. [V5 Feature] Social Sentiment Analysis
         logger.info("🐦 V5 Intelligence: Analyzing Social Sentiment...")
@@ -145,6 +182,12 @@ async def run_pipeline() -> Dict[str, Any]:
             social_data=social_map # Pass V5 Intel
         )
         unified_report['meta']['execution_time_seconds'] = (datetime.now() - start_time).total_seconds()
+        unified_report['meta']['cache_hit'] = dict(provider.cache_hits)
+        
+        # 4.1 CEX 警報只讀取 cex_flows，報告產生後即在背景執行緒發送，與後續步驟重疊
+        logger.info("🔔 檢查並發送 Discord 警報...")
+        alert_task = asyncio.create_task(asyncio.to_thread(check_and_alert, unified_report))
+        alert_tasks.append(alert_task)
         
         # 4.5. [V8 Feature] Macro Intelligence Analysis
         logger.info("🧠 V8 Macro Intelligence: Analyzing Market Regime...")
@@ -178,9 +221,8 @@ async def run_pipeline() -> Dict[str, Any]:
         
         # 6.1 [V8 Feature] Treasury Management
         if trading_result:
-            # Record any closed trades in treasury
-            for trade in trading_result.get('closed_trades', []):
-                treasury.record_trade_result(trade['pnl_usd'], trade['is_win'])
+            # Record any closed trades in treasury (批次套用，只寫檔一次)
+            treasury.bulk_record(trading_result.get('closed_trades', []))
             # Update unrealized PnL
             treasury.update_unrealized(trading_result.get('total_unrealized_pnl_usd', 0))
         
@@ -223,22 +265,29 @@ async def run_pipeline() -> Dict[str, Any]:
         unified_report['yield_farming'] = yield_data
     
     # 7. 儲存輸出
-    await _save_outputs(unified_report, chain_data, cex_data, stablecoin_marketcap)
+    await _save_outputs(unified_report, chain_by_name, cex_by_name, stablecoin_marketcap)
     
-    # 8. 發送 Discord 通知
-    logger.info("🔔 檢查並發送 Discord 警報...")
-    alerts_sent = check_and_alert(unified_report)
+    # 8. 發送摘要通知 (需完整報告，於背景執行緒發送) 並等待警報完成
+    alerts_sent, _ = await asyncio.gather(
+        alert_task,
+        asyncio.to_thread(send_summary_notification, unified_report),
+    )
     if alerts_sent > 0:
         logger.info(f"   → 已發送 {alerts_sent} 個警報")
     
-    # 8. 發送摘要通知
-    send_summary_notification(unified_report)
-    
     logger.info(f"✅ 管道執行完成 ({unified_report['meta']['execution_time_seconds']:.2f}s)")
     
     return unified_report
 
 
+async def _logged(label: str, coro: Awaitable[T]) -> T:
+    """等待單一並行任務並記錄完成耗時"""
+    started = time.perf_counter()
+    result = await coro
+    logger.info(f"   → {label} 完成 ({time.perf_counter() - started:.2f}s)")
+    return result
+
+
 async def _get_stablecoin_marketcap(provider: DataProvider) -> float:
     """
     獲取穩定幣總市值
@@ -246,11 +295,12 @@ async def _get_stablecoin_marketcap(provider: DataProvider) -> float:
     try:
         data = await provider.get_stablecoins()
         if data and 'peggedAssets' in data:
-            total = 0
-            for asset in data['peggedAssets']:
-                circulating = asset.get('circulating', {})
-                total += circulating.get('peggedUSD', 0) or 0
-            return total
+            # 一次取出所有 peggedUSD 成陣列，於 C 層加總
+            values = np.fromiter(
+                ((a.get('circulating') or {}).get('peggedUSD') or 0 for a in data['peggedAssets']),
+                dtype=np.float64,
+            )
+            return float(values.sum())
     except Exception as e:
         logger.warning(f"無法獲取穩定幣市值: {e}")
     return 0
@@ -268,20 +318,12 @@ def _calculate_sentiment_score(
     """
     derivs_data = derivs_data or {}
     fng_data = fng_data or {}
+    w_sm, w_derivs, w_chain, w_macro = SENTIMENT_WEIGHTS
     factors = []
-    total_score = 0
     
     # 1. Smart Money Flow (權重 40%) - 最重要指標
     sm_flow = cex_data.get('summary', {}).get('smart_money_stable_flow', 0)
-    score_sm = 0
-    if sm_flow > 50_000_000: score_sm = 100    # Strong Buy
-    elif sm_flow > 10_000_000: score_sm = 75   # Buy
-    elif sm_flow > 0: score_sm = 25            # Weak Buy
-    elif sm_flow < -50_000_000: score_sm = -100 # Strong Sell
-    elif sm_flow < -10_000_000: score_sm = -75  # Sell
-    elif sm_flow < 0: score_sm = -25            # Weak Sell
-    
-    total_score += score_sm * 0.4
+    score_sm = SM_SCORES[bisect_right(SM_THRESHOLDS, sm_flow)]
     factors.append({
         'name': '主力動向 (Smart Money)',
         'score': score_sm,
@@ -291,14 +333,7 @@ def _calculate_sentiment_score(
     
     # 2. Derivatives Structure (權重 30%)
     funding_btc = derivs_data.get('funding_rates', {}).get('BTC', 0.01)
-    score_derivs = 0
-    if funding_btc > 0.03: score_derivs = -80      # 極度過熱
-    elif funding_btc > 0.01: score_derivs = -40    # 偏多過熱
-    elif funding_btc < -0.01: score_derivs = 60    # 軋空預期
-    elif funding_btc < -0.02: score_derivs = 90    # 強烈軋空預期
-    else: score_derivs = 10                        # 中性偏多 (健康費率)
-    
-    total_score += score_derivs * 0.3
+    score_derivs = DERIVS_SCORES[bisect_right(DERIVS_THRESHOLDS, funding_btc)]
     factors.append({
         'name': '合約結構 (Derivatives)',
         'score': score_derivs,
@@ -309,12 +344,7 @@ def _calculate_sentiment_score(
     # 3. Chain Activity (20%)
     chain_summary = chain_data.get('summary', {})
     chain_flow = chain_summary.get('stablecoin_flow_24h', 0)
-    score_chain = 0
-    if chain_flow > 20_000_000: score_chain = 100
-    elif chain_flow > 0: score_chain = 50
-    else: score_chain = -50
-    
-    total_score += score_chain * 0.2
+    score_chain = CHAIN_SCORES[bisect_right(CHAIN_THRESHOLDS, chain_flow)]
     factors.append({
         'name': '公鏈生態 (On-chain)',
         'score': score_chain,
@@ -323,15 +353,9 @@ def _calculate_sentiment_score(
     })
     
     # 4. Macro Sentiment (Contra) (10%)
-    fng_val = fng_data.get('value', 50)
-    score_macro = 0
     # 逆勢邏輯: 極度恐慌(20)是買點(+80分)
-    if fng_val < 20: score_macro = 80       
-    elif fng_val < 40: score_macro = 40     
-    elif fng_val > 80: score_macro = -80    
-    elif fng_val > 60: score_macro = -40    
-    
-    total_score += score_macro * 0.1
+    fng_val = fng_data.get('value', 50)
+    score_macro = MACRO_SCORES[bisect_right(MACRO_THRESHOLDS, fng_val)]
     factors.append({
         'name': '市場情緒 (Sentiment)',
         'score': score_macro,
@@ -339,12 +363,10 @@ def _calculate_sentiment_score(
         'value': f"F&G {fng_val}"
     })
     
+    total_score = score_sm * w_sm + score_derivs * w_derivs + score_chain * w_chain + score_macro * w_macro
+    
     # 最終評級
-    label = 'Neutral'
-    if total_score >= 60: label = 'Strong Bullish 🚀'
-    elif total_score >= 20: label = 'Bullish 🟢'
-    elif total_score <= -60: label = 'Strong Bearish 🩸'
-    elif total_score <= -20: label = 'Bearish 🔴'
+    label = _SENTIMENT_LABELS[bisect_right(_LABEL_THRESHOLDS, total_score)]
     
     return {
         'score': round(total_score, 1),
@@ -353,6 +375,25 @@ def _calculate_sentiment_score(
     }
 
 
+def _calculate_sentiment_scores_batch(columns: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    批次情緒評分 (回測用：整欄一次分桶)
+    
+    Args:
+        columns: DataFrame 或欄位 dict，需含 sm_flow / funding_btc / chain_flow / fng
+    
+    Returns:
+        (加權總分陣列, 評級陣列)，與 _calculate_sentiment_score 逐筆結果一致 (總分未四捨五入)
+    """
+    total = calculate_sentiment_score_batch(
+        columns['sm_flow'], columns['funding_btc'], columns['chain_flow'], columns['fng']
+    )
+    labels = np.asarray(_SENTIMENT_LABELS, dtype=object)[
+        np.searchsorted(_LABEL_THRESHOLDS, total, side='right')
+    ]
+    return total, labels
+
+
 def _determine_overall_sentiment(chain_data: Dict, cex_data: Dict) -> str:
     """
     綜合判斷市場情緒 (向後兼容包裝函數)
@@ -363,69 +404,58 @@ def _determine_overall_sentiment(chain_data: Dict, cex_data: Dict) -> str:
 
 async def _save_outputs(
     snapshot: Dict, 
-    chain_data: Dict, 
-    cex_data: Dict, 
+    chain_by_name: Dict[str, Dict], 
+    cex_by_name: Dict[str, Dict], 
     stablecoin_marketcap: float
 ):
     """
     儲存輸出文件
+    
+    chain_by_name / cex_by_name: run_pipeline 建立的鏈 / 交易所名稱索引
     """
     # 確保目錄存在
     REPORTS_DIR.mkdir(exist_ok=True)
     
     # 1. 儲存 data.json
     logger.info(f"💾 儲存快照到 {DATA_JSON_PATH}...")
-    with open(DATA_JSON_PATH, 'w', encoding='utf-8') as f:
-        json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    DATA_JSON_PATH.write_bytes(_json_dumps(snapshot))
     
     # 2. 追加 history.csv
     logger.info(f"📝 追加歷史記錄到 {HISTORY_CSV_PATH}...")
-    _append_history_csv(chain_data, cex_data, stablecoin_marketcap)
+    _append_history_csv(chain_by_name, cex_by_name, stablecoin_marketcap)
 
 
-def _append_history_csv(chain_data: Dict, cex_data: Dict, stablecoin_marketcap: float):
+def _append_history_csv(
+    chain_by_name: Dict[str, Dict], 
+    cex_by_name: Dict[str, Dict], 
+    stablecoin_marketcap: float
+):
     """
     追加一行到 history.csv
     """
     # 提取所需數據
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    # 從 chain_data 提取 Solana 和 Ethereum TVL
-    solana_tvl = 0
-    ethereum_tvl = 0
-    for chain in chain_data.get('chains', []):
-        if chain.get('chain') == 'solana':
-            solana_tvl = chain.get('tvl_total', 0)
-        elif chain.get('chain') == 'ethereum':
-            ethereum_tvl = chain.get('tvl_total', 0)
-    
-    # 從 cex_data 提取 Binance 淨流入
-    binance_net_flow = 0
-    for exchange in cex_data.get('exchanges', []):
-        if exchange.get('exchange') == 'binance-cex':
-            binance_net_flow = exchange.get('net_flow_24h', 0)
-            break
+    # 從名稱索引直接取 Solana / Ethereum TVL 與 Binance 淨流入
+    solana_tvl = chain_by_name.get('solana', {}).get('tvl_total', 0)
+    ethereum_tvl = chain_by_name.get('ethereum', {}).get('tvl_total', 0)
+    binance_net_flow = cex_by_name.get('binance-cex', {}).get('net_flow_24h', 0)
     
-    # 構建行數據
-    row = {
-        'Timestamp': timestamp,
-        'Total_Stablecoin_MarketCap': stablecoin_marketcap,
-        'Binance_Net_Flow': binance_net_flow,
-        'Solana_TVL': solana_tvl,
-        'Ethereum_TVL': ethereum_tvl
-    }
+    # 欄位固定且皆為數值/時間字串，不需 DictWriter 的逐欄查找與引號處理 (金額取到小數兩位)
+    line = (f"{timestamp},{stablecoin_marketcap:.2f},{binance_net_flow:.2f},"
+            f"{solana_tvl:.2f},{ethereum_tvl:.2f}{_HISTORY_LINE_END}")
     
-    # 檢查 CSV 是否存在
-    file_exists = HISTORY_CSV_PATH.exists()
+    # 檔案不存在或為空時先寫標題行 (僅本程序第一次追加時 stat，一次同時判斷兩者)
+    global _HEADER_WRITTEN
+    if _HEADER_WRITTEN is None:
+        try:
+            _HEADER_WRITTEN = HISTORY_CSV_PATH.stat().st_size > 0
+        except FileNotFoundError:
+            _HEADER_WRITTEN = False
     
     with open(HISTORY_CSV_PATH, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
-        
-        # 如果文件不存在，寫入標題行
-        if not file_exists:
-            writer.writeheader()
-        
-        writer.writerow(row)
+        f.write(line if _HEADER_WRITTEN else _HISTORY_HEADER + line)
+    _HEADER_WRITTEN = True
     
     logger.info(f"   → 已追加: Stablecoin ${stablecoin_marketcap/1e9:.1f}B, "
                 f"Binance Flow ${binance_net_flow/1e6:+.1f}M, "
@@ -13,6 +13,7 @@
 import os
 import logging
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Any, Optional
 
@@ -26,6 +27,9 @@ DEFAULT_WEBHOOKS = [
     "https://discord.com/api/webhooks/1458033972650180640/uEoOBJBrcHtKeVY8OsyY8Qhnzicxjioz_1h9LDKQ0D0y4qX4QVp-OclnaBcPUez9lHrb"
 ]
 
+# 同時發送的 Webhook 數上限
+MAX_WEBHOOK_WORKERS = 8
+
 # 顏色定義
 COLORS = {
     'green': 0x00ff00,   # Bullish
@@ -126,9 +130,7 @@ def send_discord_alert(
         "embeds": [embed]
     }
     
-    success_count = 0
-    
-    for webhook_url in webhooks:
+    def post(index: int, webhook_url: str) -> bool:
         try:
             response = requests.post(
                 webhook_url,
@@ -138,15 +140,19 @@ def send_discord_alert(
             )
             
             if response.status_code == 204:
-                success_count += 1
-                logger.info(f"✅ Discord 通知已發送 (Webhook {webhooks.index(webhook_url) + 1})")
-            else:
-                logger.warning(f"⚠️ Discord 回應 {response.status_code}: {response.text[:100]}")
+                logger.info(f"✅ Discord 通知已發送 (Webhook {index + 1})")
+                return True
+            logger.warning(f"⚠️ Discord 回應 {response.status_code}: {response.text[:100]}")
                 
         except requests.RequestException as e:
             logger.error(f"❌ Discord 發送失敗: {e}")
+        return False
+    
+    # 各 Webhook 同時發送，總耗時約為最慢的一次請求
+    with ThreadPoolExecutor(max_workers=min(MAX_WEBHOOK_WORKERS, len(webhooks))) as pool:
+        results = list(pool.map(post, range(len(webhooks)), webhooks))
     
-    return success_count > 0
+    return any(results)
 
 
 def check_and_alert(data: Dict[str, Any]) -> int:
@@ -10,22 +10,189 @@
 輸出：結構化報告 (可直接 JSON 輸出)
 """
 
-import json
+import atexit
+import copy
+import functools
 import logging
+import math
+import os
+import threading
+from bisect import bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor
+from heapq import nlargest
+from operator import itemgetter
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from json_codec import dumps as _json_dumps, dumps_compact as _json_dumps_compact, loads as _json_loads
 
 logger = logging.getLogger(__name__)
 
+# 報告時間戳時區 (UTC+8)；週鍵仍依本機時區計算
+TW_TZ = timezone(timedelta(hours=8))
+
 # 報告目錄
 BASE_DIR = Path(__file__).parent
 REPORTS_DIR = BASE_DIR / "reports"
 WEEKLY_HISTORY_FILE = REPORTS_DIR / "weekly_history.json"
 
+# 摘要加總欄位 (順序即 SoA 陣列的欄位順序)
+CEX_SUM_FIELDS = (
+    'total_tvl', 'net_flow_24h', 'net_flow_4h',
+    'stablecoin_flow_24h', 'stablecoin_flow_4h',
+    'btc_eth_flow_24h', 'btc_eth_flow_4h',
+)
+DEX_SUM_FIELDS = (
+    'tvl_total', 'stable_inflow_24h', 'stable_inflow_4h', 'stable_inflow_7d',
+    'native_inflow_24h', 'native_inflow_4h', 'native_inflow_7d',
+    'change_7d_pct',
+)
+
 
 # ================= Helper Functions =================
 
+_USD_BILLION_CUTOFF = 999_500_000
+
+def _fmt_usd(value: float) -> str:
+    """
+    格式化美元金額，依量級自動切換單位: $XM (百萬) 或 $X.XXB (十億)
+    以「四捨五入後會顯示成 $1000M」為切換點；round() 與 :.0f 同為銀行家捨入
+    負值的負號置於 $ 之前 (例: -$2M)；四捨五入為 0 時不帶負號
+    """
+    magnitude = abs(value)
+    if magnitude >= _USD_BILLION_CUTOFF:
+        text = f"${magnitude / 1_000_000_000:.2f}B"
+    else:
+        millions = round(magnitude / 1_000_000)
+        if not millions:
+            return "$0M"
+        text = f"${millions}M"
+    return f"-{text}" if value < 0 else text
+
+
+def _fmt_b(value: float) -> str:
+    """格式化為 $X.XXB (十億美元)"""
+    return f"${value / 1_000_000_000:.2f}B"
+
+
+_weekly_history_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _read_weekly_history(path: Path, mtime_ns: int) -> Dict:
+    """讀取並解析週歷史 (以路徑 + mtime 為鍵跨實例快取；檔案變更即自動失效)"""
+    return _json_loads(path.read_bytes())
+
+
+# 週歷史寫入在背景單執行緒依序執行 (報告熱路徑只需提交)；程式結束前等待寫完
+_save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weekly-history')
+atexit.register(_save_executor.shutdown, wait=True)
+_pending_save: Optional[Future] = None
+
+
+def _wait_pending_save():
+    """等待尚未完成的背景寫入 (讀檔前呼叫，確保讀到最新快照)"""
+    if _pending_save is not None:
+        _pending_save.result()
+
+
+def _join_parts(parts: List[str]) -> str:
+    """以 " | " 串接敘述片段；單一片段直接回傳"""
+    return parts[0] if len(parts) == 1 else " | ".join(parts)
+
+
+def _column_sums(values: List[float], width: int) -> List[float]:
+    """將逐列攤平的數值視為 (n, width) float64 陣列，一次 axis=0 加總所有欄位"""
+    arr = np.array(values, dtype=np.float64).reshape(-1, width)
+    return arr.sum(axis=0).tolist()
+
+
+@dataclass
+class _ChainFrame:
+    """
+    公鏈數據的 SoA 視圖 (每份報告由 chain_data['chains'] 建立一次)
+    values 為 (n, len(DEX_SUM_FIELDS)) float64 陣列，各數值欄位為其欄視圖
+    """
+    chains: List[Dict]
+    values: np.ndarray
+    valid: np.ndarray       # bool: 無 error 的鏈
+    signals: np.ndarray     # 定寬字串: tags[0]['signal']，無標籤為空字串
+    
+    @classmethod
+    def from_chains(cls, chains: List[Dict]) -> '_ChainFrame':
+        flat: List[float] = []
+        valid: List[bool] = []
+        signals: List[str] = []
+        for c in chains:
+            flat.extend([c.get(k, 0) or 0 for k in DEX_SUM_FIELDS])
+            valid.append(not c.get('error'))
+            tags = c.get('tags')
+            signals.append((tags[0].get('signal') or '') if tags else '')
+        return cls(
+            chains=chains,
+            values=np.array(flat, dtype=np.float64).reshape(-1, len(DEX_SUM_FIELDS)),
+            valid=np.array(valid, dtype=bool),
+            signals=np.array(signals, dtype=str),
+        )
+    
+    @property
+    def stable_24h(self) -> np.ndarray:
+        return self.values[:, 1]
+    
+    @property
+    def stable_4h(self) -> np.ndarray:
+        return self.values[:, 2]
+    
+    @property
+    def change_7d(self) -> np.ndarray:
+        return self.values[:, 7]
+
+
+@dataclass
+class _FlowAnalysis:
+    """單側 (CEX 或 DEX) 分析結果: 摘要 + 主導行動 + 行動敘述，一次算完"""
+    summary: Dict[str, Any]
+    action: str
+    action_narrative: str
+    
+    def report_summary(self, *keys: str) -> Dict[str, Any]:
+        """報告用摘要區塊: 指定摘要欄位 + 行動判斷"""
+        block = {k: self.summary[k] for k in keys}
+        block['dominant_action'] = self.action
+        block['action_narrative'] = self.action_narrative
+        return block
+
+
+def above(threshold: float) -> float:
+    """嚴格大於 (x > t) 轉為 bisect_right 可用的閉區間下界 (x >= t⁺)"""
+    return math.nextafter(threshold, math.inf)
+
+
+# 情緒評分查表: bisect_right(門檻, x) 即分數索引 (門檻需遞增)
+# 因子門檻 / 分數 / 權重為公開介面，main.py 的情緒評分共用同一組 (改動會同時影響兩邊)
+# 1. Smart Money Flow: <-50M / <-10M / <0 / =0 / >0 / >10M / >50M
+SM_THRESHOLDS = (-50_000_000, -10_000_000, 0, above(0), above(10_000_000), above(50_000_000))
+SM_SCORES = (-100, -75, -25, 0, 25, 75, 100)
+# 2. BTC Funding: <-0.01 軋空預期 / 健康費率 / >0.01 偏多過熱 / >0.03 極度過熱
+DERIVS_THRESHOLDS = (-0.01, above(0.01), above(0.03))
+DERIVS_SCORES = (60, 10, -40, -80)
+# 3. 公鏈穩定幣流入: <=0 / >0 / >20M
+CHAIN_THRESHOLDS = (above(0), above(20_000_000))
+CHAIN_SCORES = (-50, 50, 100)
+# 4. F&G (逆勢): <20 / <40 / 中性 / >60 / >80
+MACRO_THRESHOLDS = (20, 40, above(60), above(80))
+MACRO_SCORES = (80, 40, 0, -40, -80)
+SENTIMENT_WEIGHTS = (0.4, 0.3, 0.2, 0.1)
+# 總分標籤 (報告專屬): <-60 / >=-60 / >=-20 / >=20 / >=60
+_LABEL_THRESHOLDS = (-60, -20, 20, 60)
+_LABELS = ("Bearish 🔴", "Leaning Bearish 🌧️", "Neutral ☁️", "Leaning Bullish 🌤️", "Bullish 🟢")
+
+
 def _calculate_sentiment_score(
     chain_data: Dict, 
     cex_data: Dict, 
@@ -38,91 +205,178 @@ def _calculate_sentiment_score(
     """
     derivs_data = derivs_data or {}
     fng_data = fng_data or {}
-    factors = []
-    total_score = 0
+    w_sm, w_derivs, w_chain, w_macro = SENTIMENT_WEIGHTS
     
     # 1. Smart Money Flow (權重 40%) - 最重要指標
     sm_flow = cex_data.get('summary', {}).get('smart_money_stable_flow', 0)
-    score_sm = 0
-    if sm_flow > 50_000_000: score_sm = 100    # Strong Buy
-    elif sm_flow > 10_000_000: score_sm = 75   # Buy
-    elif sm_flow > 0: score_sm = 25            # Weak Buy
-    elif sm_flow < -50_000_000: score_sm = -100 # Strong Sell
-    elif sm_flow < -10_000_000: score_sm = -75  # Sell
-    elif sm_flow < 0: score_sm = -25            # Weak Sell
-    
-    total_score += score_sm * 0.4
-    factors.append({
-        'name': '主力動向 (Smart Money)',
-        'score': score_sm,
-        'weight': '40%',
-        'value': f"${sm_flow/1e6:+.1f}M"
-    })
+    score_sm = SM_SCORES[bisect_right(SM_THRESHOLDS, sm_flow)]
     
     # 2. Derivatives Structure (權重 30%)
     funding_btc = derivs_data.get('funding_rates', {}).get('BTC', 0.01)
-    score_derivs = 0
-    if funding_btc > 0.03: score_derivs = -80      # 極度過熱
-    elif funding_btc > 0.01: score_derivs = -40    # 偏多過熱
-    elif funding_btc < -0.01: score_derivs = 60    # 軋空預期
-    elif funding_btc < -0.02: score_derivs = 90    # 強烈軋空預期
-    else: score_derivs = 10                        # 中性偏多 (健康費率)
-    
-    total_score += score_derivs * 0.3
-    factors.append({
-        'name': '合約結構 (Derivatives)',
-        'score': score_derivs,
-        'weight': '30%',
-        'value': f"Funding {funding_btc*100:.4f}%"
-    })
+    score_derivs = DERIVS_SCORES[bisect_right(DERIVS_THRESHOLDS, funding_btc)]
     
     # 3. Chain Activity (20%)
-    chain_summary = chain_data.get('summary', {})
-    chain_flow = chain_summary.get('stablecoin_flow_24h', 0)
-    score_chain = 0
-    if chain_flow > 20_000_000: score_chain = 100
-    elif chain_flow > 0: score_chain = 50
-    else: score_chain = -50
-    
-    total_score += score_chain * 0.2
-    factors.append({
-        'name': '公鏈生態 (On-chain)',
-        'score': score_chain,
-        'weight': '20%',
-        'value': f"${chain_flow/1e6:+.1f}M"
-    })
+    chain_flow = chain_data.get('summary', {}).get('stablecoin_flow_24h', 0)
+    score_chain = CHAIN_SCORES[bisect_right(CHAIN_THRESHOLDS, chain_flow)]
     
-    # 4. Macro Sentiment (Contra) (10%)
+    # 4. Macro Sentiment (Contra) (10%) - 逆勢邏輯: 極度恐慌(20)是買點(+80分)
     fng_val = fng_data.get('value', 50)
-    score_macro = 0
-    # 逆勢邏輯: 極度恐慌(20)是買點(+80分)
-    if fng_val < 20: score_macro = 80       
-    elif fng_val < 40: score_macro = 40     
-    elif fng_val > 80: score_macro = -80    
-    elif fng_val > 60: score_macro = -40    
-    
-    total_score += score_macro * 0.1
-    factors.append({
-        'name': '市場情緒 (Sentiment)',
-        'score': score_macro,
-        'weight': '10%',
-        'value': f"F&G {fng_val}"
-    })
+    score_macro = MACRO_SCORES[bisect_right(MACRO_THRESHOLDS, fng_val)]
+    
+    total_score = (score_sm * w_sm + score_derivs * w_derivs
+                   + score_chain * w_chain + score_macro * w_macro)
     
-    # Determine Label
-    if total_score >= 60: label = "Bullish 🟢"
-    elif total_score >= 20: label = "Leaning Bullish 🌤️"
-    elif total_score >= -20: label = "Neutral ☁️"
-    elif total_score >= -60: label = "Leaning Bearish 🌧️"
-    else: label = "Bearish 🔴"
+    factors = [
+        {
+            'name': '主力動向 (Smart Money)',
+            'score': score_sm,
+            'weight': '40%',
+            'value': f"${sm_flow/1e6:+.1f}M"
+        },
+        {
+            'name': '合約結構 (Derivatives)',
+            'score': score_derivs,
+            'weight': '30%',
+            'value': f"Funding {funding_btc*100:.4f}%"
+        },
+        {
+            'name': '公鏈生態 (On-chain)',
+            'score': score_chain,
+            'weight': '20%',
+            'value': f"${chain_flow/1e6:+.1f}M"
+        },
+        {
+            'name': '市場情緒 (Sentiment)',
+            'score': score_macro,
+            'weight': '10%',
+            'value': f"F&G {fng_val}"
+        },
+    ]
     
     return {
         "score": round(total_score, 1),
-        "label": label,
+        "label": _LABELS[bisect_right(_LABEL_THRESHOLDS, total_score)],
         "factors": factors
     }
 
 
+def calculate_sentiment_score_batch(
+    sm_flows: np.ndarray,
+    funding_btc: np.ndarray,
+    chain_flows: np.ndarray,
+    fng_values: np.ndarray
+) -> np.ndarray:
+    """
+    批次情緒評分 (回測用，例如逐筆回放 weekly_history 快照)
+    與 _calculate_sentiment_score 共用同一組查表，np.searchsorted 一次處理整個陣列
+    Returns: 每筆的加權總分 (未四捨五入)
+    """
+    w_sm, w_derivs, w_chain, w_macro = SENTIMENT_WEIGHTS
+    
+    def lookup(thresholds, scores, values):
+        idx = np.searchsorted(thresholds, np.asarray(values, dtype=np.float64), side='right')
+        return np.asarray(scores, dtype=np.float64)[idx]
+    
+    return (
+        lookup(SM_THRESHOLDS, SM_SCORES, sm_flows) * w_sm
+        + lookup(DERIVS_THRESHOLDS, DERIVS_SCORES, funding_btc) * w_derivs
+        + lookup(CHAIN_THRESHOLDS, CHAIN_SCORES, chain_flows) * w_chain
+        + lookup(MACRO_THRESHOLDS, MACRO_SCORES, fng_values) * w_macro
+    )
+
+
+# Alpha Hunter 理由字串 (依 bit 位置排列，順序即輸出順序)
+_LONG_REASONS = ("7日趨勢向上", "24H資金流入", "4H短線動能", "巨量交易", "⚠️ 費率過熱", "軋空潛力")
+_SHORT_REASONS = ("7日趨勢向下", "24H資金流出", "4H短線拋壓", "巨量流出", "⚠️ 做空擁擠")
+
+
+def _score_chains_long(flow_24h: np.ndarray, flow_4h: np.ndarray, funding_rate: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    做多評分核心 (整欄向量化；僅對 7D 趨勢向上且 24H 資金流入的鏈有意義)
+    Returns: (scores, reason_masks)，mask 各 bit 對應 _LONG_REASONS
+    """
+    momentum = (flow_4h > 0).astype(np.int64)          # Momentum Boost
+    volume = (flow_24h > 10_000_000).astype(np.int64)  # Volume Boost
+    scores = 60 + 20 * momentum + 10 * volume
+    masks = 0b11 | momentum << 2 | volume << 3
+    if funding_rate > 0.03:                            # > 0.03% is overheated
+        scores -= 30
+        masks |= 0b10000
+    elif funding_rate < 0:                             # Short Squeeze Potential
+        scores += 10
+        masks |= 0b100000
+    return scores, masks
+
+
+def _score_chains_short(flow_24h: np.ndarray, flow_4h: np.ndarray, funding_rate: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    做空評分核心 (整欄向量化；僅對 7D 趨勢向下且 24H 資金流出的鏈有意義)
+    Returns: (scores, reason_masks)，mask 各 bit 對應 _SHORT_REASONS
+    """
+    momentum = (flow_4h < 0).astype(np.int64)
+    volume = (flow_24h < -10_000_000).astype(np.int64)
+    scores = 60 + 20 * momentum + 10 * volume
+    masks = 0b11 | momentum << 2 | volume << 3
+    if funding_rate < -0.03:                           # Too many shorts already
+        scores -= 30
+        masks |= 0b10000
+    return scores, masks
+
+
+_BY_SCORE = itemgetter('score')
+_WHALE_FLOW_4H = 20_000_000    # CEX 4H 單所巨量流動門檻
+
+
+def _decode_reasons(mask: int, reasons: Tuple[str, ...]) -> str:
+    """將理由 bitmask 轉回 " + " 串接的中文理由"""
+    return " + ".join(r for i, r in enumerate(reasons) if mask >> i & 1)
+
+
+def _build_cex_action_table() -> tuple:
+    """
+    預先展開 CEX 行動判斷 (5 bits 狀態碼 → 行動)
+    bit0: 穩定幣 > +SIG | bit1: 穩定幣 < -SIG
+    bit2: BTC/ETH > +SIG | bit3: BTC/ETH < -SIG | bit4: BTC/ETH < 0
+    """
+    table = []
+    for code in range(32):
+        stable_in, stable_out, btc_in, btc_out, btc_neg = ((code >> i) & 1 for i in range(5))
+        if stable_in and btc_neg:
+            table.append("積極買入準備")
+        elif stable_in:
+            table.append("買盤累積")
+        elif btc_in:
+            table.append("潛在賣壓")
+        elif stable_out and btc_out:
+            table.append("全面提幣")
+        elif stable_out:
+            table.append("穩定幣撤離")
+        else:
+            table.append("持平觀望")
+    return tuple(table)
+
+
+def _build_dex_action_table() -> tuple:
+    """
+    預先展開 DEX 行動判斷 (4 bits 狀態碼 → 行動)
+    bit0: 穩定幣 > +SIG | bit1: 穩定幣 < -SIG | bit2: 淨流入 > 0 | bit3: 淨流入 < 0
+    """
+    table = []
+    for code in range(16):
+        stable_in, stable_out, net_pos, net_neg = ((code >> i) & 1 for i in range(4))
+        if stable_in:
+            table.append("DeFi 資金流入")
+        elif stable_out:
+            table.append("DeFi 資金撤離")
+        elif net_pos:
+            table.append("TVL 增長中")
+        elif net_neg:
+            table.append("TVL 下降中")
+        else:
+            table.append("持平穩定")
+    return tuple(table)
+
+
 class ReportGenerator:
 
     """
@@ -135,30 +389,141 @@ class ReportGenerator:
     """
     
     # 閾值配置 (統一單位: USD)
-    THRESHOLDS = {
+    THRESHOLDS = MappingProxyType({
         'significant_flow': 50_000_000,      # $50M = 顯著流動
         'large_flow': 200_000_000,           # $200M = 大量流動
         'massive_flow': 500_000_000,         # $500M = 巨量流動
+    })
+    
+    # 展開後的閾值常數 (熱路徑比較免去 dict 查找與除法)
+    _SIG = THRESHOLDS['significant_flow']
+    _LARGE = THRESHOLDS['large_flow']
+    _MASSIVE = THRESHOLDS['massive_flow']
+    _SIG_4H = _SIG / 6                       # 4H 視窗按 24H 的 1/6 縮放
+    _SIG_NEG = -_SIG
+    _LARGE_NEG = -_LARGE
+    _MASSIVE_NEG = -_MASSIVE
+    
+    # 4H 敘述規則: (來源, 欄位, 流入模板, 流出模板)；|值| 超過 _SIG_4H 才輸出
+    _4H_RULES = (
+        ('cex', 'stablecoin_flow_4h', "【CEX】穩定幣流入 {}，交易所買盤備戰中", "【CEX】穩定幣流出 {}，買盤資金撤離"),
+        ('cex', 'btc_eth_flow_4h', "BTC/ETH 流入交易所 {} (潛在賣壓)", "BTC/ETH 流出交易所 {} (囤貨信號)"),
+        ('dex', 'stablecoin_flow_4h', "【DEX】穩定幣流入鏈上 {}，DeFi 活動增加", "【DEX】穩定幣流出鏈上 {}，資金撤離 DeFi"),
+    )
+    
+    # 24H 敘述規則: (來源, 欄位, 階梯)；階梯為 (閾值, 是否取「大於」, 模板)，每欄只取第一個命中
+    _24H_RULES = (
+        ('cex', 'stablecoin_flow_24h', (
+            (_LARGE, True, "🟢 CEX 穩定幣大量流入 {}，市場積極備戰買入"),
+            (_SIG, True, "🟡 CEX 穩定幣流入 {}，買盤逐步累積"),
+            (_LARGE_NEG, False, "🔴 CEX 穩定幣大量流出 {}，買盤資金撤離"),
+        )),
+        ('cex', 'btc_eth_flow_24h', (
+            (_LARGE, True, "⚠️ BTC/ETH 大量流入交易所 {}，賣壓警告"),
+            (_LARGE_NEG, False, "💎 BTC/ETH 大量流出交易所 {}，長期囤貨信號"),
+        )),
+        ('dex', 'net_flow_24h', (
+            (_LARGE, True, "🌊 鏈上 TVL 增加 {}，DeFi 活動活躍"),
+            (_LARGE_NEG, False, "📉 鏈上 TVL 減少 {}，資金撤離 DeFi"),
+        )),
+    )
+    # 24H 綜合判斷: (條件(穩定幣, BTC/ETH), 敘述)，只取第一個命中
+    _24H_COMBO_RULES = (
+        (lambda stable, btc_eth: stable > 0 and btc_eth < 0, "📊 綜合：買盤積極備戰 (穩定幣入+BTC/ETH出)"),
+        (lambda stable, btc_eth: stable < 0 and btc_eth > 0, "📊 綜合：賣壓風險升高 (穩定幣出+BTC/ETH入)"),
+    )
+    
+    # 7D 敘述階梯: (閾值, 是否取「大於」, 金額格式, 模板)；皆未命中時輸出平穩敘述
+    _7D_RULES = (
+        (_MASSIVE, True, _fmt_b, "🚀 本週鏈上 TVL 大幅增長 {amount} (+{pct:.1f}%)"),
+        (_LARGE, True, _fmt_usd, "📈 本週鏈上 TVL 穩健增長 {amount} (+{pct:.1f}%)"),
+        (_MASSIVE_NEG, False, _fmt_b, "📉 本週鏈上 TVL 大幅下降 {amount} ({pct:.1f}%)"),
+        (_LARGE_NEG, False, _fmt_usd, "⚠️ 本週鏈上 TVL 下降 {amount} ({pct:.1f}%)"),
+    )
+    
+    # 狀態碼 → 行動查表 (取代逐層 if/elif 判斷)
+    _CEX_ACTION_BY_CODE = _build_cex_action_table()
+    _DEX_ACTION_BY_CODE = _build_dex_action_table()
+    
+    # 行動敘述 (類別層級建立一次；僅對命中的行動格式化字串)
+    _CEX_ACTION_NARRATIVES = {
+        "積極買入準備": lambda stable, btc_eth: f"交易所穩定幣流入 {_fmt_usd(stable)} 同時 BTC/ETH 流出 {_fmt_usd(abs(btc_eth))}，資金正積極準備買入",
+        "買盤累積": lambda stable, btc_eth: f"穩定幣持續流入交易所 {_fmt_usd(stable)}，買盤力道增強",
+        "潛在賣壓": lambda stable, btc_eth: f"BTC/ETH 流入交易所 {_fmt_usd(btc_eth)}，需警惕賣壓",
+        "全面提幣": lambda stable, btc_eth: "穩定幣與 BTC/ETH 同時流出交易所，市場進入囤貨模式",
+        "穩定幣撤離": lambda stable, btc_eth: f"穩定幣流出交易所 {_fmt_usd(abs(stable))}，買盤資金減少",
+        "持平觀望": lambda stable, btc_eth: "交易所資金流向平穩，市場觀望中"
     }
+    _DEX_ACTION_NARRATIVES = {
+        "DeFi 資金流入": lambda stable, net: f"穩定幣流入鏈上 {_fmt_usd(stable)}，DeFi 活動增加",
+        "DeFi 資金撤離": lambda stable, net: f"穩定幣從鏈上流出 {_fmt_usd(abs(stable))}，資金撤離 DeFi",
+        "TVL 增長中": lambda stable, net: f"鏈上總 TVL 增加 {_fmt_usd(net)}",
+        "TVL 下降中": lambda stable, net: f"鏈上總 TVL 減少 {_fmt_usd(abs(net))}",
+        "持平穩定": lambda stable, net: "鏈上資金流向平穩"
+    }
+    
+    # 報告目錄是否已確認存在 (跨實例共用，只需 mkdir 一次)
+    _reports_dir_ready = False
+    
+    # 固定實例屬性 (免去每個實例的 __dict__；weekly_history 為類別層級 property)
+    __slots__ = ('_weekly_history', '_history_dirty', '_last_report_key', '_last_report')
     
     def __init__(self):
-        self.weekly_history = self._load_weekly_history()
+        self._weekly_history: Optional[Dict] = None  # 首次存取時才載入
+        self._history_dirty = False
+        self._last_report_key: Optional[Tuple] = None
+        self._last_report: Optional[Dict[str, Any]] = None
+    
+    @property
+    def weekly_history(self) -> Dict:
+        """歷史週快照 (延遲載入：只需敘述的呼叫端不必讀檔解析)"""
+        if self._weekly_history is None:
+            self._weekly_history = self._load_weekly_history()
+        return self._weekly_history
+    
+    @weekly_history.setter
+    def weekly_history(self, value: Dict):
+        self._weekly_history = value
     
     def _load_weekly_history(self) -> Dict:
-        """載入歷史週快照"""
+        """載入歷史週快照 (共用快取，回傳深拷貝供本實例修改)"""
+        _wait_pending_save()
         if WEEKLY_HISTORY_FILE.exists():
             try:
-                with open(WEEKLY_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                mtime_ns = WEEKLY_HISTORY_FILE.stat().st_mtime_ns
+                with _weekly_history_lock:
+                    cached = _read_weekly_history(WEEKLY_HISTORY_FILE, mtime_ns)
+                return copy.deepcopy(cached)
             except Exception as e:
                 logger.warning(f"無法載入週歷史: {e}")
         return {"snapshots": []}
     
     def _save_weekly_history(self):
-        """儲存週快照"""
-        REPORTS_DIR.mkdir(exist_ok=True)
-        with open(WEEKLY_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.weekly_history, f, indent=2, ensure_ascii=False)
+        """儲存週快照 (無變更則略過；交由背景執行緒寫檔)"""
+        global _pending_save
+        if not self._history_dirty:
+            return
+        # 快照 dict 建立後不再修改，複製外層結構即可與後續追加隔離
+        history = dict(self.weekly_history)
+        history['snapshots'] = list(history.get('snapshots', []))
+        self._history_dirty = False
+        _pending_save = _save_executor.submit(self._write_weekly_history, history)
+    
+    @staticmethod
+    def _write_weekly_history(history: Dict):
+        """寫入週歷史 (先寫暫存檔再原子替換；於背景執行緒執行)"""
+        try:
+            if not ReportGenerator._reports_dir_ready:
+                REPORTS_DIR.mkdir(exist_ok=True)
+                ReportGenerator._reports_dir_ready = True
+            tmp_file = WEEKLY_HISTORY_FILE.with_suffix('.tmp')
+            tmp_file.write_bytes(_json_dumps(history))
+            os.replace(tmp_file, WEEKLY_HISTORY_FILE)
+        except Exception as e:
+            logger.error(f"週歷史寫入失敗: {e}")
+        finally:
+            with _weekly_history_lock:
+                _read_weekly_history.cache_clear()
     
     def generate_unified_report(
         self, 
@@ -167,20 +532,43 @@ class ReportGenerator:
         stablecoin_marketcap: float,
         derivs_data: Dict = None,
         fng_data: Dict = None,
-        social_data: Dict = None # V5 Feature
+        social_data: Dict = None, # V5 Feature
+        use_cache: bool = False
     ) -> Dict[str, Any]:
         """
         生成統一格式報告 (包含 Social Sentiment)
+        
+        use_cache: 輸入與週歷史狀態未變時，直接回傳上一份報告的副本
+                   (僅同一實例重複呼叫時有益；單次執行的管道勿開啟，
+                    否則每次白付指紋序列化與報告深拷貝的成本)
         """
-        cex_summary = self._calculate_cex_summary(cex_data)
-        dex_summary = self._calculate_dex_summary(chain_data)
+        # 單一時間點: meta 與週快照共用，避免多次取時與跨週邊界不一致
+        now = datetime.now(TW_TZ)
+        generated_at = now.isoformat()
+        
+        cache_key = None
+        if use_cache:
+            cache_key = self._report_cache_key(
+                now, chain_data, cex_data, stablecoin_marketcap,
+                derivs_data, fng_data, social_data
+            )
+            if cache_key is not None and cache_key == self._last_report_key:
+                report = copy.deepcopy(self._last_report)
+                report['meta']['generated_at'] = generated_at
+                return report
+        
+        chain_frame = _ChainFrame.from_chains(chain_data.get('chains', []))
+        cex = self._analyze_cex(cex_data)
+        dex = self._analyze_dex(chain_data, chain_frame)
+        cex_summary = cex.summary
+        dex_summary = dex.summary
         
         # Determine Sentiment
         sentiment_result = _calculate_sentiment_score(chain_data, cex_data, derivs_data, fng_data)
         
         # Generate Alpha Opportunities (with Social Intel)
         alpha_opportunities = self._generate_alpha_opportunities(
-            chain_data, cex_data, derivs_data, social_data
+            chain_data, cex_data, derivs_data, social_data, chain_frame
         )
         
         # 生成各時間週期敘述
@@ -193,10 +581,20 @@ class ReportGenerator:
         # 生成週比較
         weekly_comparison = self._generate_weekly_comparison(cex_summary, dex_summary)
         
+        # 多處重複引用的摘要欄位先綁定為區域變數
+        c_tvl = cex_summary['total_tvl']
+        c_nf24 = cex_summary['net_flow_24h']
+        c_sf24 = cex_summary['stablecoin_flow_24h']
+        c_be24 = cex_summary['btc_eth_flow_24h']
+        d_tvl = dex_summary['total_tvl']
+        d_nf24 = dex_summary['net_flow_24h']
+        d_sf24 = dex_summary['stablecoin_flow_24h']
+        d_native24 = dex_summary['native_flow_24h']
+        
         # 組裝統一報告
         report = {
             "meta": {
-                "generated_at": datetime.now(timezone(timedelta(hours=8))).isoformat(),
+                "generated_at": generated_at,
                 "version": "v3.0.0"
             },
             
@@ -209,14 +607,14 @@ class ReportGenerator:
                     "stable_flow_24h": cex_summary.get('smart_money_stable_flow', 0)
                 },
                 "total_tvl": {
-                    "cex": cex_summary['total_tvl'],
-                    "dex": dex_summary['total_tvl'],
-                    "total": cex_summary['total_tvl'] + dex_summary['total_tvl']
+                    "cex": c_tvl,
+                    "dex": d_tvl,
+                    "total": c_tvl + d_tvl
                 },
                 "total_flow_24h": {
-                    "cex": cex_summary['net_flow_24h'],
-                    "dex": dex_summary['net_flow_24h'],
-                    "total": cex_summary['net_flow_24h'] + dex_summary['net_flow_24h']
+                    "cex": c_nf24,
+                    "dex": d_nf24,
+                    "total": c_nf24 + d_nf24
                 }
             },
             
@@ -236,14 +634,14 @@ class ReportGenerator:
                 },
                 "24h": {
                     "cex": {
-                        "net_flow": cex_summary['net_flow_24h'],
-                        "stablecoin_flow": cex_summary['stablecoin_flow_24h'],
-                        "btc_eth_flow": cex_summary['btc_eth_flow_24h']
+                        "net_flow": c_nf24,
+                        "stablecoin_flow": c_sf24,
+                        "btc_eth_flow": c_be24
                     },
                     "dex": {
-                        "net_flow": dex_summary['net_flow_24h'],
-                        "stablecoin_flow": dex_summary['stablecoin_flow_24h'],
-                        "native_flow": dex_summary['native_flow_24h']
+                        "net_flow": d_nf24,
+                        "stablecoin_flow": d_sf24,
+                        "native_flow": d_native24
                     },
                     "narrative": narratives['24h']
                 },
@@ -265,26 +663,16 @@ class ReportGenerator:
             "alpha_opportunities": alpha_opportunities,
             
             "cex_analysis": {
-                "summary": {
-                    "total_tvl": cex_summary['total_tvl'],
-                    "net_flow_24h": cex_summary['net_flow_24h'],
-                    "stablecoin_flow_24h": cex_summary['stablecoin_flow_24h'],
-                    "btc_eth_flow_24h": cex_summary['btc_eth_flow_24h'],
-                    "dominant_action": self._determine_cex_action(cex_summary),
-                    "action_narrative": self._generate_cex_action_narrative(cex_summary)
-                },
+                "summary": cex.report_summary(
+                    'total_tvl', 'net_flow_24h', 'stablecoin_flow_24h', 'btc_eth_flow_24h'
+                ),
                 "exchanges": cex_data.get('exchanges', [])
             },
             
             "dex_analysis": {
-                "summary": {
-                    "total_tvl": dex_summary['total_tvl'],
-                    "net_flow_24h": dex_summary['net_flow_24h'],
-                    "stablecoin_flow_24h": dex_summary['stablecoin_flow_24h'],
-                    "native_flow_24h": dex_summary['native_flow_24h'],
-                    "dominant_action": self._determine_dex_action(dex_summary),
-                    "action_narrative": self._generate_dex_action_narrative(dex_summary)
-                },
+                "summary": dex.report_summary(
+                    'total_tvl', 'net_flow_24h', 'stablecoin_flow_24h', 'native_flow_24h'
+                ),
                 "chains": chain_data.get('chains', [])
             },
             
@@ -294,49 +682,119 @@ class ReportGenerator:
         }
         
         # 儲存週快照 (每週一次)
-        self._maybe_save_weekly_snapshot(cex_summary, dex_summary)
+        self._maybe_save_weekly_snapshot(cex_summary, dex_summary, now=now)
+        
+        if cache_key is not None:
+            # 快取鍵對應的是產生報告「之前」的週歷史狀態；
+            # 若本次剛寫入新快照，下次呼叫的鍵自然不同而重新計算
+            self._last_report_key = cache_key
+            self._last_report = copy.deepcopy(report)
         
         return report
     
+    def stream_unified_report(
+        self,
+        writer: Any,
+        chain_data: Dict,
+        cex_data: Dict,
+        stablecoin_marketcap: float,
+        derivs_data: Dict = None,
+        fng_data: Dict = None,
+        social_data: Dict = None
+    ) -> None:
+        """
+        以 JSON 串流寫出統一報告 (逐個頂層區段序列化)
+        
+        writer: 具 write(bytes) 的輸出端 (檔案 / HTTP 回應串流)
+        不保留報告快取副本，也不一次序列化整份報告；
+        峰值記憶體約為最大單一區段 (通常是 chain_flows)
+        """
+        report = self.generate_unified_report(
+            chain_data, cex_data, stablecoin_marketcap,
+            derivs_data, fng_data, social_data
+        )
+        writer.write(b'{')
+        for i, (key, section) in enumerate(report.items()):
+            if i:
+                writer.write(b',')
+            writer.write(_json_dumps_compact(key))
+            writer.write(b':')
+            writer.write(_json_dumps_compact(section))
+        writer.write(b'}')
+    
+    def _report_cache_key(self, now: datetime, *inputs: Any) -> Optional[Tuple]:
+        """
+        報告快取鍵: 輸入內容指紋 + 本週週鍵 + 最新週快照
+        (跨週或週歷史變動時必定失效；無法序列化的輸入則不快取)
+        """
+        try:
+            fingerprint = hash(_json_dumps_compact(inputs))
+        except (TypeError, ValueError):
+            return None
+        snapshots = self.weekly_history.get('snapshots', [])
+        last_week_key = snapshots[-1].get('week_key') if snapshots else None
+        return (
+            fingerprint,
+            now.astimezone().strftime('%Y-W%W'),
+            len(snapshots),
+            last_week_key,
+        )
+    
     def _calculate_cex_summary(self, cex_data: Dict) -> Dict:
-        """計算 CEX 摘要數據"""
-        exchanges = cex_data.get('exchanges', [])
-        valid_exchanges = [e for e in exchanges if not e.get('error')]
+        """計算 CEX 摘要數據 (SoA 欄位陣列，一次向量化加總)"""
+        width = len(CEX_SUM_FIELDS)
+        values: List[float] = []
+        for e in cex_data.get('exchanges', []):
+            if not e.get('error'):
+                values.extend([e.get(k, 0) or 0 for k in CEX_SUM_FIELDS])
+        
+        (total_tvl, net_flow_24h, net_flow_4h,
+         stablecoin_flow_24h, stablecoin_flow_4h,
+         btc_eth_flow_24h, btc_eth_flow_4h) = _column_sums(values, width)
         
         return {
-            'total_tvl': sum(e.get('total_tvl', 0) for e in valid_exchanges),
-            'net_flow_24h': sum(e.get('net_flow_24h', 0) for e in valid_exchanges),
-            'net_flow_4h': sum(e.get('net_flow_4h', 0) for e in valid_exchanges),
-            'stablecoin_flow_24h': sum(e.get('stablecoin_flow_24h', 0) for e in valid_exchanges),
-            'stablecoin_flow_4h': sum(e.get('stablecoin_flow_4h', 0) for e in valid_exchanges),
-            'btc_eth_flow_24h': sum(e.get('btc_eth_flow_24h', 0) for e in valid_exchanges),
-            'btc_eth_flow_4h': sum(e.get('btc_eth_flow_4h', 0) for e in valid_exchanges),
-            'exchange_count': len(valid_exchanges),
+            'total_tvl': total_tvl,
+            'net_flow_24h': net_flow_24h,
+            'net_flow_4h': net_flow_4h,
+            'stablecoin_flow_24h': stablecoin_flow_24h,
+            'stablecoin_flow_4h': stablecoin_flow_4h,
+            'btc_eth_flow_24h': btc_eth_flow_24h,
+            'btc_eth_flow_4h': btc_eth_flow_4h,
+            'exchange_count': len(values) // width,
             'smart_money_stable_flow': cex_data.get('summary', {}).get('smart_money_stable_flow', 0)
         }
     
-    def _calculate_dex_summary(self, chain_data: Dict) -> Dict:
-        """計算 DEX/鏈上摘要數據"""
-        chains = chain_data.get('chains', [])
-        valid_chains = [c for c in chains if not c.get('error')]
+    def _calculate_dex_summary(self, chain_data: Dict, frame: Optional[_ChainFrame] = None) -> Dict:
+        """計算 DEX/鏈上摘要數據 (SoA 欄位陣列，一次向量化加總)"""
+        if frame is None:
+            frame = _ChainFrame.from_chains(chain_data.get('chains', []))
+        valid = frame.valid
+        
+        (total_tvl, stable_24h, stable_4h, stable_7d,
+         native_24h, native_4h, native_7d,
+         change_7d_sum) = frame.values[valid].sum(axis=0).tolist()
+        chain_count = int(valid.sum())
+        
+        # Count Signals (定寬字串陣列直接向量化比對)
+        signals = frame.signals[valid]
+        bullish_signals = int((signals == 'Bullish').sum())
+        bearish_signals = int((signals == 'Bearish').sum())
         
         return {
-            'total_tvl': sum(c.get('tvl_total', 0) for c in valid_chains),
-            'net_flow_24h': sum(c.get('stable_inflow_24h', 0) + c.get('native_inflow_24h', 0) for c in valid_chains),
-            'net_flow_4h': sum(c.get('stable_inflow_4h', 0) + c.get('native_inflow_4h', 0) for c in valid_chains),
-            'net_flow_7d': sum(c.get('stable_inflow_7d', 0) + c.get('native_inflow_7d', 0) for c in valid_chains),
-            'stablecoin_flow_24h': sum(c.get('stable_inflow_24h', 0) for c in valid_chains),
-            'stablecoin_flow_4h': sum(c.get('stable_inflow_4h', 0) for c in valid_chains),
-            'stablecoin_flow_7d': sum(c.get('stable_inflow_7d', 0) for c in valid_chains),
-            'native_flow_24h': sum(c.get('native_inflow_24h', 0) for c in valid_chains),
-            'native_flow_4h': sum(c.get('native_inflow_4h', 0) for c in valid_chains),
-            'native_flow_7d': sum(c.get('native_inflow_7d', 0) for c in valid_chains),
-            'change_7d_pct': sum(c.get('change_7d_pct', 0) for c in valid_chains) / max(len(valid_chains), 1),
-            'chain_count': len(valid_chains),
-            
-            # Count Signals
-            'bullish_signals': sum(1 for c in valid_chains if c.get('tags') and c['tags'][0].get('signal') == 'Bullish'),
-            'bearish_signals': sum(1 for c in valid_chains if c.get('tags') and c['tags'][0].get('signal') == 'Bearish')
+            'total_tvl': total_tvl,
+            'net_flow_24h': stable_24h + native_24h,
+            'net_flow_4h': stable_4h + native_4h,
+            'net_flow_7d': stable_7d + native_7d,
+            'stablecoin_flow_24h': stable_24h,
+            'stablecoin_flow_4h': stable_4h,
+            'stablecoin_flow_7d': stable_7d,
+            'native_flow_24h': native_24h,
+            'native_flow_4h': native_4h,
+            'native_flow_7d': native_7d,
+            'change_7d_pct': change_7d_sum / max(chain_count, 1),
+            'chain_count': chain_count,
+            'bullish_signals': bullish_signals,
+            'bearish_signals': bearish_signals
         }
     
     
@@ -345,220 +803,164 @@ class ReportGenerator:
         chain_data: Dict, 
         cex_data: Dict,
         derivs_data: Dict,
-        social_data: Dict = None # V5 Feature
+        social_data: Dict = None, # V5 Feature
+        chain_frame: Optional[_ChainFrame] = None,
+        top_k: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         V3 Alpha Hunter: 自動篩選高勝率交易機會
         邏輯: 趨勢(7D) + 動能(4H) + 資金(Stable) + 結構(Derivs)
+        top_k: 只需前 K 名時以 heapq 部分排序 (None = 回傳全部)
         """
         opportunities = []
-        chains = chain_data.get('chains', [])
         exchanges = cex_data.get('exchanges', [])
+        if chain_frame is None:
+            chain_frame = _ChainFrame.from_chains(chain_data.get('chains', []))
         
-        # 1. Chain Screener (Golden Setup)
-        for chain in chains:
+        # 1. Chain Screener (Golden Setup) - 整欄向量化評分，只對入選的鏈建立結果
+        # 費率過濾器 (Funding Filter) - 若市場過熱，不做多
+        # 這裡簡單假設大多數鏈跟隨 ETH/BTC 費率，或未來可擴充 specific funding
+        funding_rates = (derivs_data or {}).get('funding_rates') or {}
+        funding_rate = funding_rates.get('ETH', 0)
+        flow_24h = chain_frame.stable_24h
+        flow_4h = chain_frame.stable_4h
+        tvl_change_7d = chain_frame.change_7d
+        
+        long_scores, long_masks = _score_chains_long(flow_24h, flow_4h, funding_rate)
+        short_scores, short_masks = _score_chains_short(flow_24h, flow_4h, funding_rate)
+        long_hits = (tvl_change_7d > 0) & (flow_24h > 0) & (long_scores >= 85)
+        short_hits = (tvl_change_7d < 0) & (flow_24h < 0) & (short_scores >= 80)
+        
+        # 依原鏈順序輸出 (同分時排序結果與逐鏈判斷一致)
+        for i in np.flatnonzero(long_hits | short_hits):
+            chain = chain_frame.chains[i]
             name = chain['chain']
-            flow_stable_24h = chain.get('stable_inflow_24h', 0)
-            flow_stable_4h = chain.get('stable_inflow_4h', 0)
-            tvl_change_7d = chain.get('change_7d_pct', 0)
-            
-            # 費率過濾器 (Funding Filter) - 若市場過熱，不做多
-            # 這裡簡單假設大多數鏈跟隨 ETH/BTC 費率，或未來可擴充 specific funding
-            funding_filter_passed = True
-            funding_rate = derivs_data.get('funding_rates', {}).get('ETH', 0)
+            data = f"7D:{tvl_change_7d[i]:.1f}% | 24H:${flow_24h[i]/1e6:.1f}M"
             
             # --- LONG Logic ---
-            if tvl_change_7d > 0 and flow_stable_24h > 0:
-                score = 60
-                reasons = ["7日趨勢向上", "24H資金流入"]
-                
-                # Momentum Boost
-                if flow_stable_4h > 0:
-                    score += 20
-                    reasons.append("4H短線動能")
-                
-                # Volume Boost
-                if flow_stable_24h > 10_000_000:
-                    score += 10
-                    reasons.append("巨量交易")
-                    
-                # Derivs Check (Safety)
-                if funding_rate > 0.03: # > 0.03% is overheated
-                    score -= 30
-                    reasons.append("⚠️ 費率過熱")
-                elif funding_rate < 0: # Short Squeeze Potential
-                    score += 10
-                    reasons.append("軋空潛力")
+            if long_hits[i]:
+                top_protocols = chain.get('top_protocols', []) # V4 Feature
+                opp = {
+                    "asset": name.upper(),
+                    "type": "CHAIN",
+                    "direction": "買入訊號 🟢",
+                    "score": int(long_scores[i]),
+                    "reason": _decode_reasons(int(long_masks[i]), _LONG_REASONS),
+                    "data": data
+                }
+                if top_protocols:
+                    opp['related_tokens'] = []
+                    opp['related_info'] = []
                     
-                if score >= 85:
-                    top_protocols = chain.get('top_protocols', []) # V4 Feature
-                    opp = {
-                        "asset": name.upper(),
-                        "type": "CHAIN",
-                        "direction": "買入訊號 🟢",
-                        "score": score,
-                        "reason": " + ".join(reasons),
-                        "data": f"7D:{tvl_change_7d:.1f}% | 24H:${flow_stable_24h/1e6:.1f}M"
-                    }
-                    if top_protocols:
-                        opp['related_tokens'] = []
-                        opp['related_info'] = []
+                    for p in top_protocols:
+                        symbol = p['symbol']
+                        # V5 Social Intel Injection
+                        social_score = 0
+                        if social_data and symbol in social_data:
+                            s_info = social_data[symbol]
+                            social_score = s_info.get('score', 50)
+                            if social_score > 60:
+                                symbol += " 🔥" # Hot Sentiment
                         
-                        for p in top_protocols:
-                            symbol = p['symbol']
-                            # V5 Social Intel Injection
-                            social_score = 0
-                            if social_data and symbol in social_data:
-                                s_info = social_data[symbol]
-                                social_score = s_info.get('score', 50)
-                                if social_score > 60:
-                                    symbol += " 🔥" # Hot Sentiment
-                            
-                            opp['related_tokens'].append(symbol)
-                            opp['related_info'].append(p)
-                    
-                    opportunities.append(opp)
+                        opp['related_tokens'].append(symbol)
+                        opp['related_info'].append(p)
+                
+                opportunities.append(opp)
 
             # --- SHORT Logic ---
-            if tvl_change_7d < 0 and flow_stable_24h < 0:
-                score = 60
-                reasons = ["7日趨勢向下", "24H資金流出"]
-                
-                if flow_stable_4h < 0:
-                    score += 20
-                    reasons.append("4H短線拋壓")
-                    
-                if flow_stable_24h < -10_000_000:
-                    score += 10
-                    reasons.append("巨量流出")
-                    
-                # Derivs Check
-                if funding_rate < -0.03: # Too many shorts already
-                    score -= 30
-                    reasons.append("⚠️ 做空擁擠")
-                    
-                if score >= 80:
-                    opportunities.append({
-                        "asset": name.upper(),
-                        "type": "CHAIN",
-                        "direction": "做空訊號 🔴",
-                        "score": score,
-                        "reason": " + ".join(reasons),
-                        "data": f"7D:{tvl_change_7d:.1f}% | 24H:${flow_stable_24h/1e6:.1f}M"
-                    })
-
-        # 2. CEX Screener (Whale Action)
-        for ex in exchanges:
-            name = ex['exchange']
-            stable_flow_4h = ex.get('stablecoin_flow_4h', 0)
-            btc_flow_4h = ex.get('btc_eth_flow_4h', 0)
-            
-            if stable_flow_4h > 20_000_000:
+            else:
                 opportunities.append({
                     "asset": name.upper(),
+                    "type": "CHAIN",
+                    "direction": "做空訊號 🔴",
+                    "score": int(short_scores[i]),
+                    "reason": _decode_reasons(int(short_masks[i]), _SHORT_REASONS),
+                    "data": data
+                })
+
+        # 2. CEX Screener (Whale Action) - 4H 流量整欄比對，只對命中的交易所建立結果
+        # (買入 90 分 / 倒貨 85 分，分組輸出經穩定排序後與逐所交錯輸出順序一致)
+        if exchanges:
+            flows_4h = np.array(
+                [[ex.get('stablecoin_flow_4h', 0) or 0, ex.get('btc_eth_flow_4h', 0) or 0] for ex in exchanges],
+                dtype=np.float64
+            )
+            stable_flow_4h = flows_4h[:, 0]
+            btc_flow_4h = flows_4h[:, 1]
+            
+            for i in np.flatnonzero(stable_flow_4h > _WHALE_FLOW_4H):
+                opportunities.append({
+                    "asset": exchanges[i]['exchange'].upper(),
                     "type": "CEX",
                     "direction": "買入訊號 🟢",
                     "score": 90,
                     "reason": "4H穩定幣巨量流入 (主力建倉)",
-                    "data": f"4H Stable: +${stable_flow_4h/1e6:.1f}M"
+                    "data": f"4H Stable: +${stable_flow_4h[i]/1e6:.1f}M"
                 })
-                
-            if btc_flow_4h > 20_000_000:
+            
+            for i in np.flatnonzero(btc_flow_4h > _WHALE_FLOW_4H):
                 opportunities.append({
-                    "asset": name.upper(),
+                    "asset": exchanges[i]['exchange'].upper(),
                     "type": "CEX",
                     "direction": "倒貨警報 🔴",
                     "score": 85,
                     "reason": "BTC巨量轉入交易所 (主力倒貨)",
-                    "data": f"4H BTC Inflow: +${btc_flow_4h/1e6:.1f}M"
+                    "data": f"4H BTC Inflow: +${btc_flow_4h[i]/1e6:.1f}M"
                 })
         
         # Sort
-        opportunities.sort(key=lambda x: x['score'], reverse=True)
+        if top_k is not None:
+            return nlargest(top_k, opportunities, key=_BY_SCORE)
+        opportunities.sort(key=_BY_SCORE, reverse=True)
         return opportunities
 
     def _generate_4h_narrative(self, cex: Dict, dex: Dict) -> str:
         """生成 4H 敘述性分析"""
+        sources = {'cex': cex, 'dex': dex}
+        threshold = self._SIG_4H
         parts = []
-        cex_stable = cex['stablecoin_flow_4h']
-        cex_btc_eth = cex['btc_eth_flow_4h']
-        
-        if abs(cex_stable) > self.THRESHOLDS['significant_flow'] / 6:
-            if cex_stable > 0:
-                parts.append(f"【CEX】穩定幣流入 ${cex_stable/1e6:.0f}M，交易所買盤備戰中")
-            else:
-                parts.append(f"【CEX】穩定幣流出 ${abs(cex_stable)/1e6:.0f}M，買盤資金撤離")
-        
-        if abs(cex_btc_eth) > self.THRESHOLDS['significant_flow'] / 6:
-            if cex_btc_eth > 0:
-                parts.append(f"BTC/ETH 流入交易所 ${cex_btc_eth/1e6:.0f}M (潛在賣壓)")
-            else:
-                parts.append(f"BTC/ETH 流出交易所 ${abs(cex_btc_eth)/1e6:.0f}M (囤貨信號)")
-        
-        dex_stable = dex['stablecoin_flow_4h']
-        if abs(dex_stable) > self.THRESHOLDS['significant_flow'] / 6:
-            if dex_stable > 0:
-                parts.append(f"【DEX】穩定幣流入鏈上 ${dex_stable/1e6:.0f}M，DeFi 活動增加")
-            else:
-                parts.append(f"【DEX】穩定幣流出鏈上 ${abs(dex_stable)/1e6:.0f}M，資金撤離 DeFi")
+        for source, key, inflow, outflow in self._4H_RULES:
+            value = sources[source][key]
+            if abs(value) > threshold:
+                parts.append((inflow if value > 0 else outflow).format(_fmt_usd(abs(value))))
         
         if not parts:
-            parts.append("過去 4 小時資金流向平穩，無顯著異動")
+            return "過去 4 小時資金流向平穩，無顯著異動"
         
-        return " | ".join(parts)
+        return _join_parts(parts)
     
     def _generate_24h_narrative(self, cex: Dict, dex: Dict) -> str:
         """生成 24H 敘述性分析"""
+        sources = {'cex': cex, 'dex': dex}
         parts = []
+        for source, key, ladder in self._24H_RULES:
+            value = sources[source][key]
+            for threshold, above, template in ladder:
+                if (value > threshold) if above else (value < threshold):
+                    parts.append(template.format(_fmt_usd(abs(value))))
+                    break
+        
         cex_stable = cex['stablecoin_flow_24h']
         cex_btc_eth = cex['btc_eth_flow_24h']
-        
-        if cex_stable > self.THRESHOLDS['large_flow']:
-            parts.append(f"🟢 CEX 穩定幣大量流入 ${cex_stable/1e6:.0f}M，市場積極備戰買入")
-        elif cex_stable > self.THRESHOLDS['significant_flow']:
-            parts.append(f"🟡 CEX 穩定幣流入 ${cex_stable/1e6:.0f}M，買盤逐步累積")
-        elif cex_stable < -self.THRESHOLDS['large_flow']:
-            parts.append(f"🔴 CEX 穩定幣大量流出 ${abs(cex_stable)/1e6:.0f}M，買盤資金撤離")
-        
-        if cex_btc_eth > self.THRESHOLDS['large_flow']:
-            parts.append(f"⚠️ BTC/ETH 大量流入交易所 ${cex_btc_eth/1e6:.0f}M，賣壓警告")
-        elif cex_btc_eth < -self.THRESHOLDS['large_flow']:
-            parts.append(f"💎 BTC/ETH 大量流出交易所 ${abs(cex_btc_eth)/1e6:.0f}M，長期囤貨信號")
-        
-        dex_net = dex['net_flow_24h']
-        if dex_net > self.THRESHOLDS['large_flow']:
-            parts.append(f"🌊 鏈上 TVL 增加 ${dex_net/1e6:.0f}M，DeFi 活動活躍")
-        elif dex_net < -self.THRESHOLDS['large_flow']:
-            parts.append(f"📉 鏈上 TVL 減少 ${abs(dex_net)/1e6:.0f}M，資金撤離 DeFi")
-        
-        if cex_stable > 0 and cex_btc_eth < 0:
-            parts.append("📊 綜合：買盤積極備戰 (穩定幣入+BTC/ETH出)")
-        elif cex_stable < 0 and cex_btc_eth > 0:
-            parts.append("📊 綜合：賣壓風險升高 (穩定幣出+BTC/ETH入)")
+        for matches, sentence in self._24H_COMBO_RULES:
+            if matches(cex_stable, cex_btc_eth):
+                parts.append(sentence)
+                break
         
         if not parts:
-            parts.append("過去 24 小時市場資金流向平穩，無明顯異動")
+            return "過去 24 小時市場資金流向平穩，無明顯異動"
         
-        return " | ".join(parts)
+        return _join_parts(parts)
     
     def _generate_7d_narrative(self, cex: Dict, dex: Dict) -> str:
-        """生成 7D 敘述性分析"""
-        parts = []
+        """生成 7D 敘述性分析 (恆為單一敘述)"""
         dex_7d = dex.get('net_flow_7d', 0)
         dex_change = dex.get('change_7d_pct', 0)
         
-        if dex_7d > self.THRESHOLDS['massive_flow']:
-            parts.append(f"🚀 本週鏈上 TVL 大幅增長 ${dex_7d/1e9:.2f}B (+{dex_change:.1f}%)")
-        elif dex_7d > self.THRESHOLDS['large_flow']:
-            parts.append(f"📈 本週鏈上 TVL 穩健增長 ${dex_7d/1e6:.0f}M (+{dex_change:.1f}%)")
-        elif dex_7d < -self.THRESHOLDS['massive_flow']:
-            parts.append(f"📉 本週鏈上 TVL 大幅下降 ${abs(dex_7d)/1e9:.2f}B ({dex_change:.1f}%)")
-        elif dex_7d < -self.THRESHOLDS['large_flow']:
-            parts.append(f"⚠️ 本週鏈上 TVL 下降 ${abs(dex_7d)/1e6:.0f}M ({dex_change:.1f}%)")
-        else:
-            parts.append(f"本週鏈上 TVL 變化 {dex_change:+.1f}%，整體平穩")
-        
-        return " | ".join(parts)
+        for threshold, above, fmt, template in self._7D_RULES:
+            if (dex_7d > threshold) if above else (dex_7d < threshold):
+                return template.format(amount=fmt(abs(dex_7d)), pct=dex_change)
+        return f"本週鏈上 TVL 變化 {dex_change:+.1f}%，整體平穩"
     
     def _generate_weekly_comparison(self, cex: Dict, dex: Dict) -> Dict:
         """生成週比較分析"""
@@ -570,11 +972,11 @@ class ReportGenerator:
                 "narrative": "首次運行，尚無上週數據可供比較"
             }
         
-        cex_flow_change = cex['net_flow_24h'] - last_week.get('cex_net_flow_24h', 0)
-        dex_flow_change = dex['net_flow_24h'] - last_week.get('dex_net_flow_24h', 0)
+        last_cex = last_week.get('cex_net_flow_24h', 0) or 0
+        last_dex = last_week.get('dex_net_flow_24h', 0) or 0
         
-        cex_change_pct = (cex_flow_change / abs(last_week.get('cex_net_flow_24h', 1))) * 100 if last_week.get('cex_net_flow_24h') else 0
-        dex_change_pct = (dex_flow_change / abs(last_week.get('dex_net_flow_24h', 1))) * 100 if last_week.get('dex_net_flow_24h') else 0
+        cex_change_pct = (cex['net_flow_24h'] - last_cex) / abs(last_cex) * 100 if last_cex else 0
+        dex_change_pct = (dex['net_flow_24h'] - last_dex) / abs(last_dex) * 100 if last_dex else 0
         
         parts = []
         if cex_change_pct > 20:
@@ -592,7 +994,7 @@ class ReportGenerator:
             "cex_flow_change_pct": round(cex_change_pct, 1),
             "dex_flow_change_pct": round(dex_change_pct, 1),
             "last_week_date": last_week.get('date', 'N/A'),
-            "narrative": " | ".join(parts) if parts else "與上週相比資金流向變化不大"
+            "narrative": _join_parts(parts) if parts else "與上週相比資金流向變化不大"
         }
     
     def _get_last_week_snapshot(self) -> Optional[Dict]:
@@ -602,18 +1004,18 @@ class ReportGenerator:
             return snapshots[-1]
         return None
     
-    def _maybe_save_weekly_snapshot(self, cex: Dict, dex: Dict):
-        """如果是新的一週，儲存快照"""
-        today = datetime.now()
-        week_key = today.strftime('%Y-W%W')
+    def _maybe_save_weekly_snapshot(self, cex: Dict, dex: Dict, now: Optional[datetime] = None):
+        """如果是新的一週，儲存快照 (週鍵以本機時區計算)"""
+        today = (now or datetime.now(timezone.utc)).astimezone()
+        week_key, date_str = today.strftime('%Y-W%W|%Y-%m-%d').split('|')
         
         snapshots = self.weekly_history.get('snapshots', [])
-        existing_weeks = [s.get('week_key') for s in snapshots]
         
-        if week_key not in existing_weeks:
+        # 快照依週序追加，只需比對最後一筆即可判斷本週是否已存
+        if not (snapshots and snapshots[-1].get('week_key') == week_key):
             snapshot = {
                 'week_key': week_key,
-                'date': today.strftime('%Y-%m-%d'),
+                'date': date_str,
                 'cex_net_flow_24h': cex['net_flow_24h'],
                 'cex_stablecoin_flow_24h': cex['stablecoin_flow_24h'],
                 'dex_net_flow_24h': dex['net_flow_24h'],
@@ -621,6 +1023,7 @@ class ReportGenerator:
             }
             snapshots.append(snapshot)
             self.weekly_history['snapshots'] = snapshots[-12:]
+            self._history_dirty = True
             self._save_weekly_history()
             logger.info(f"💾 已儲存週快照: {week_key}")
     
@@ -629,79 +1032,70 @@ class ReportGenerator:
         stable = cex['stablecoin_flow_24h']
         btc_eth = cex['btc_eth_flow_24h']
         
-        if stable > self.THRESHOLDS['significant_flow'] and btc_eth < 0:
-            return "積極買入準備"
-        elif stable > self.THRESHOLDS['significant_flow']:
-            return "買盤累積"
-        elif btc_eth > self.THRESHOLDS['significant_flow']:
-            return "潛在賣壓"
-        elif stable < -self.THRESHOLDS['significant_flow'] and btc_eth < -self.THRESHOLDS['significant_flow']:
-            return "全面提幣"
-        elif stable < -self.THRESHOLDS['significant_flow']:
-            return "穩定幣撤離"
-        else:
-            return "持平觀望"
+        code = ((stable > self._SIG)
+                | (stable < self._SIG_NEG) << 1
+                | (btc_eth > self._SIG) << 2
+                | (btc_eth < self._SIG_NEG) << 3
+                | (btc_eth < 0) << 4)
+        return self._CEX_ACTION_BY_CODE[code]
     
     def _determine_dex_action(self, dex: Dict) -> str:
         """判斷 DEX 主要行動"""
         net_flow = dex['net_flow_24h']
         stable = dex['stablecoin_flow_24h']
         
-        if stable > self.THRESHOLDS['significant_flow']:
-            return "DeFi 資金流入"
-        elif stable < -self.THRESHOLDS['significant_flow']:
-            return "DeFi 資金撤離"
-        elif net_flow > 0:
-            return "TVL 增長中"
-        elif net_flow < 0:
-            return "TVL 下降中"
-        else:
-            return "持平穩定"
+        code = ((stable > self._SIG)
+                | (stable < self._SIG_NEG) << 1
+                | (net_flow > 0) << 2
+                | (net_flow < 0) << 3)
+        return self._DEX_ACTION_BY_CODE[code]
     
-    def _generate_cex_action_narrative(self, cex: Dict) -> str:
-        """生成 CEX 行動敘述"""
-        action = self._determine_cex_action(cex)
-        stable = cex['stablecoin_flow_24h']
-        btc_eth = cex['btc_eth_flow_24h']
-        
-        narratives = {
-            "積極買入準備": f"交易所穩定幣流入 ${stable/1e6:.0f}M 同時 BTC/ETH 流出 ${abs(btc_eth)/1e6:.0f}M，資金正積極準備買入",
-            "買盤累積": f"穩定幣持續流入交易所 ${stable/1e6:.0f}M，買盤力道增強",
-            "潛在賣壓": f"BTC/ETH 流入交易所 ${btc_eth/1e6:.0f}M，需警惕賣壓",
-            "全面提幣": f"穩定幣與 BTC/ETH 同時流出交易所，市場進入囤貨模式",
-            "穩定幣撤離": f"穩定幣流出交易所 ${abs(stable)/1e6:.0f}M，買盤資金減少",
-            "持平觀望": "交易所資金流向平穩，市場觀望中"
-        }
-        return narratives.get(action, "無特殊行動")
+    def _analyze_cex(self, cex_data: Dict) -> _FlowAnalysis:
+        """CEX 摘要 + 行動判斷 + 行動敘述 (行動只判斷一次)"""
+        summary = self._calculate_cex_summary(cex_data)
+        action = self._determine_cex_action(summary)
+        return _FlowAnalysis(summary, action, self._generate_cex_action_narrative(summary, action))
     
-    def _generate_dex_action_narrative(self, dex: Dict) -> str:
-        """生成 DEX 行動敘述"""
-        action = self._determine_dex_action(dex)
-        stable = dex['stablecoin_flow_24h']
-        net = dex['net_flow_24h']
-        
-        narratives = {
-            "DeFi 資金流入": f"穩定幣流入鏈上 ${stable/1e6:.0f}M，DeFi 活動增加",
-            "DeFi 資金撤離": f"穩定幣從鏈上流出 ${abs(stable)/1e6:.0f}M，資金撤離 DeFi",
-            "TVL 增長中": f"鏈上總 TVL 增加 ${net/1e6:.0f}M",
-            "TVL 下降中": f"鏈上總 TVL 減少 ${abs(net)/1e6:.0f}M",
-            "持平穩定": "鏈上資金流向平穩"
-        }
-        return narratives.get(action, "無特殊行動")
+    def _analyze_dex(self, chain_data: Dict, frame: Optional[_ChainFrame] = None) -> _FlowAnalysis:
+        """DEX 摘要 + 行動判斷 + 行動敘述 (行動只判斷一次)"""
+        summary = self._calculate_dex_summary(chain_data, frame)
+        action = self._determine_dex_action(summary)
+        return _FlowAnalysis(summary, action, self._generate_dex_action_narrative(summary, action))
+    
+    def _generate_cex_action_narrative(self, cex: Dict, action: Optional[str] = None) -> str:
+        """生成 CEX 行動敘述 (可傳入已判斷的 action 避免重算)"""
+        if action is None:
+            action = self._determine_cex_action(cex)
+        render = self._CEX_ACTION_NARRATIVES.get(action)
+        if render is None:
+            return "無特殊行動"
+        return render(cex['stablecoin_flow_24h'], cex['btc_eth_flow_24h'])
+    
+    def _generate_dex_action_narrative(self, dex: Dict, action: Optional[str] = None) -> str:
+        """生成 DEX 行動敘述 (可傳入已判斷的 action 避免重算)"""
+        if action is None:
+            action = self._determine_dex_action(dex)
+        render = self._DEX_ACTION_NARRATIVES.get(action)
+        if render is None:
+            return "無特殊行動"
+        return render(dex['stablecoin_flow_24h'], dex['net_flow_24h'])
     
     def _calculate_data_quality(self, chain_data: Dict, cex_data: Dict) -> int:
-        """計算整體數據品質分數"""
-        scores = []
-        
-        for chain in chain_data.get('chains', []):
-            scores.append(chain.get('confidence_score', 50))
+        """計算整體數據品質分數 (單次累加，不建立中間串列)"""
+        chains = chain_data.get('chains', ())
+        exchanges = cex_data.get('exchanges', ())
+        count = len(chains) + len(exchanges)
+        if not count:
+            return 50
         
-        for ex in cex_data.get('exchanges', []):
-            scores.append(ex.get('confidence_score', 50))
+        total = 0
+        for chain in chains:
+            total += chain.get('confidence_score', 50)
+        for ex in exchanges:
+            total += ex.get('confidence_score', 50)
         
-        if scores:
-            return int(sum(scores) / len(scores))
-        return 50
+        # 分數皆為 0-100 非負值，整除即等同原先 int(平均)
+        return int(total // count)
 
 
 if __name__ == '__main__':
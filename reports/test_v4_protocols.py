@@ -1,54 +1,144 @@
 
-import requests
+import asyncio
+import heapq
+import io
+import itertools
 import json
+import sys
 import time
+from pathlib import Path
 
-def get_top_protocols(chain_name):
-    print(f"🔍 Fetching protocols for chain: {chain_name}...")
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import disk_cache  # 與管道共用 /protocols 磁碟快取
+from http_client import acquire_session, release_session  # 與管道共用連線池
+
+try:
+    import ijson  # 串流解析：逐筆讀取協議，不建立整份 JSON
+except ImportError:  # 未安裝時退回整份解析
+    ijson = None
+
+PROTOCOLS_URL = "https://api.llama.fi/protocols"
+CACHE_TTL = 300  # 秒；TTL 內重複呼叫直接使用上次的結果
+TOP_N = 5
+
+# (url, chains) -> (抓取時間, 各鏈 Top Movers)
+_result_cache = {}
+
+
+def target_chain_name(chain_name):
+    # Note: DefiLlama uses specific formatting for chains, usually capitalized or specific slugs
+    # We need to handle case sensitivity. "Ethereum", "Solana", "Binance" (for BSC)
+    target_chain = chain_name.title()
+    if target_chain == 'Bsc': target_chain = 'Binance'
+    return target_chain
+
+
+def push_protocol(heaps, p, seq):
+    """單一協議放入所屬各鏈的有界 heap (每鏈只保留 change_1d 最高的 TOP_N 筆)"""
+    # We only want significant protocols, say TVL > 1M
+    if p.get('tvl', 0) <= 1_000_000:
+        return
+    chains = p.get('chains', [])
+    record = None
+    for target_chain, heap in heaps.items():
+        # Check if chain is in the protocol's chains list
+        if target_chain in chains or p.get('chain') == target_chain:
+            if record is None:
+                record = {
+                    'name': p['name'],
+                    'symbol': p['symbol'],
+                    'tvl': p['tvl'],
+                    'change_1d': p.get('change_1d', 0),
+                    'category': p.get('category', 'Unknown')
+                }
+            # Let's find "Movers" - highest 24h growth (同分時先出現者優先，與穩定排序一致)
+            item = (record['change_1d'] or -100, -seq, record)
+            if len(heap) < TOP_N:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+
+
+def collect_results(chains, heaps):
+    return {
+        c: [rec for _, _, rec in sorted(heaps[target_chain_name(c)], reverse=True, key=lambda x: x[:2])]
+        for c in chains
+    }
+
+
+class TeeStream:
+    """非同步讀取來源時，把讀到的每一塊同時寫入 sink (供 ijson 串流解析兼寫快取)"""
+
+    def __init__(self, source, sink):
+        self._source = source
+        self._sink = sink
+
+    async def read(self, n=-1):
+        chunk = await self._source.read(n)
+        self._sink.write(chunk)
+        return chunk
+
+
+def parse_protocols(heaps, seq, payload):
+    """解析已在記憶體中的 /protocols 內容 (磁碟快取命中時)"""
+    if ijson is not None:
+        protocols = ijson.items(io.BytesIO(payload), 'item', use_float=True)
+    else:
+        protocols = json.loads(payload)
+    for p in protocols:
+        push_protocol(heaps, p, next(seq))
+
+
+async def fetch_all(chains):
+    """/protocols 只下載並走訪一次，所有鏈共用同一趟串流"""
+    cache_key = (PROTOCOLS_URL, tuple(chains))
+    cached = _result_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < CACHE_TTL:
+        return cached[1]
+
+    print(f"🔍 Fetching protocols for chains: {', '.join(chains)}...")
+    heaps = {target_chain_name(c): [] for c in chains}
+    seq = itertools.count()
     try:
-        # DefiLlama protocols endpoint
-        url = "https://api.llama.fi/protocols"
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Filter for the specific chain
-        # Note: DefiLlama uses specific formatting for chains, usually capitalized or specific slugs
-        # We need to handle case sensitivity. "Ethereum", "Solana", "Binance" (for BSC)
-        
-        target_chain = chain_name.title()
-        if target_chain == 'Bsc': target_chain = 'Binance'
-        
-        chain_protocols = []
-        for p in data:
-            # Check if chain is in the protocol's chains list
-            if target_chain in p.get('chains', []) or p.get('chain') == target_chain:
-                # We only want significant protocols, say TVL > 1M
-                if p.get('tvl', 0) > 1_000_000:
-                    chain_protocols.append({
-                        'name': p['name'],
-                        'symbol': p['symbol'],
-                        'tvl': p['tvl'],
-                        'change_1d': p.get('change_1d', 0),
-                        'category': p.get('category', 'Unknown')
-                    })
-        
-        # Sort by 1-day change to find "Hot" protocols, or TVL for "Safe" ones
-        # Let's find "Movers" - highest 24h growth
-        chain_protocols.sort(key=lambda x: x['change_1d'] or -100, reverse=True)
-        
-        return chain_protocols[:5]
-        
+        payload = disk_cache.load_bytes('protocols', ttl=CACHE_TTL)
+        if payload is not None:
+            parse_protocols(heaps, seq, payload)
+        else:
+            session = await acquire_session()
+            try:
+                async with session.get(PROTOCOLS_URL, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    response.raise_for_status()
+                    # 邊下載邊解析，原始位元組同時逐塊寫入磁碟快取
+                    with disk_cache.open_writer('protocols') as cache_file:
+                        if ijson is not None:
+                            stream = TeeStream(response.content, cache_file)
+                            async for p in ijson.items(stream, 'item', use_float=True):
+                                push_protocol(heaps, p, next(seq))
+                            await stream.read()  # 補寫解析器未讀到的尾端位元組，快取才完整
+                        else:
+                            payload = await response.read()
+                            cache_file.write(payload)
+                            parse_protocols(heaps, seq, payload)
+            finally:
+                await release_session()
     except Exception as e:
         print(f"❌ Error: {e}")
-        return []
+        return {c: [] for c in chains}
+
+    results = collect_results(chains, heaps)
+    _result_cache[cache_key] = (time.monotonic(), results)
+    return results
+
 
 # Test with a few chains
 chains_to_test = ['Solana', 'Ethereum', 'Base', 'Bsc', 'Arbitrum']
 
-for c in chains_to_test:
-    top = get_top_protocols(c)
-    print(f"\n🏆 Top Movers on {c}:")
-    for p in top:
-        print(f"   - {p['name']} ({p['symbol']}): +{p['change_1d']:.2f}% (TVL: ${p['tvl']/1e6:.1f}M) [{p['category']}]")
-    print("-" * 30)
+if __name__ == "__main__":
+    results = asyncio.run(fetch_all(chains_to_test))
+    for c in chains_to_test:
+        print(f"\n🏆 Top Movers on {c}:")
+        for p in results[c]:
+            print(f"   - {p['name']} ({p['symbol']}): +{p['change_1d']:.2f}% (TVL: ${p['tvl']/1e6:.1f}M) [{p['category']}]")
+        print("-" * 30)
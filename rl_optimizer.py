@@ -1,12 +1,19 @@
 
-import json
 import logging
+import os
 from pathlib import Path
 from typing import List, Dict
 from datetime import datetime
 
+import numpy as np
+
+from json_codec import dumps as _json_dumps, loads as _json_loads
+
 logger = logging.getLogger(__name__)
 
+# 交易統計用結構化陣列欄位
+_TRADE_DTYPE = [('pnl', 'f8'), ('is_long', '?'), ('is_short', '?'), ('closed', '?')]
+
 class RLOptimizer:
     """
     V7 RL Core: Reinforcement Learning Optimizer (自我進化模組)
@@ -43,17 +50,23 @@ class RLOptimizer:
             logger.info("   ⚠ No trade history found. Skipping optimization.")
             return
 
-        # 1. Analyze Performance
-        closed_trades = [t for t in trades if t['status'] != 'OPEN']
-        if len(closed_trades) < 5:
+        # 1. Analyze Performance (一次轉為結構化陣列，以布林遮罩統計)
+        arr = np.array(
+            [(t.get('pnl_pct', 0) or 0, t.get('direction') == 'LONG', t.get('direction') == 'SHORT', t['status'] != 'OPEN')
+             for t in trades],
+            dtype=_TRADE_DTYPE
+        )
+        closed = arr[arr['closed']]
+        total_closed = len(closed)
+        if total_closed < 5:
             logger.info("   ⚠ Not enough closed trades (<5) for statistical significance.")
             return
 
-        win_trades = [t for t in closed_trades if t.get('pnl_pct', 0) > 0]
-        loss_trades = [t for t in closed_trades if t.get('pnl_pct', 0) <= 0]
+        pnl = closed['pnl']
+        losses = pnl <= 0
         
-        win_rate = len(win_trades) / len(closed_trades)
-        avg_pnl = sum([t.get('pnl_pct', 0) for t in closed_trades]) / len(closed_trades)
+        win_rate = float((~losses).mean())
+        avg_pnl = float(pnl.mean())
         
         logger.info(f"   📊 Performance: Win Rate {win_rate*100:.1f}%, Avg PnL {avg_pnl:.2f}%")
 
@@ -62,23 +75,23 @@ class RLOptimizer:
         # If we are losing money on LONGs -> Market is Bearish -> Boost Skeptic
         # If we are losing money on SHORTs -> Market is Bullish -> Boost Aggressor
         
-        long_losses = [t for t in loss_trades if t['direction'] == 'LONG']
-        short_losses = [t for t in loss_trades if t['direction'] == 'SHORT']
+        long_losses = int((losses & closed['is_long']).sum())
+        short_losses = int((losses & closed['is_short']).sum())
         
         current_config = self._load_config()
-        weights = current_config.get('weights', self.default_weights)
+        weights = dict(current_config.get('weights', self.default_weights))
         
         # Learning Rate
         alpha = 0.1 
         
         # Scenario A: Longs are failing (Aggressor is too bullish)
-        if len(long_losses) > len(short_losses):
+        if long_losses > short_losses:
             logger.info("   📉 Detected weakness in LONG strategies. Reducing Momentum weight.")
             weights['Momentum'] = max(0.5, weights['Momentum'] - alpha)
             weights['Risk Control'] = min(2.0, weights['Risk Control'] + alpha)
             
         # Scenario B: Shorts are failing (Skeptic is too bearish)
-        elif len(short_losses) > len(long_losses):
+        elif short_losses > long_losses:
             logger.info("   📈 Detected weakness in SHORT strategies. Reducing Risk Control weight.")
             weights['Risk Control'] = max(0.5, weights['Risk Control'] - alpha)
             weights['Momentum'] = min(2.0, weights['Momentum'] + alpha)
@@ -93,20 +106,25 @@ class RLOptimizer:
             "updated_at": datetime.now().isoformat(),
             "weights": weights,
             "stats": {
-                "total_trades": len(closed_trades),
+                "total_trades": total_closed,
                 "win_rate": round(win_rate * 100, 1),
                 "avg_pnl": round(avg_pnl, 2)
             }
         }
         
+        # 權重與統計皆未變時不重寫設定檔
+        if (weights == current_config.get('weights')
+                and new_config['stats'] == current_config.get('stats')):
+            logger.info("   ✅ Policy unchanged.")
+            return
+        
         self._save_config(new_config)
         logger.info(f"   ✅ Policy Updated: {weights}")
 
     def _load_trades(self) -> List[Dict]:
         if self.trades_file.exists():
             try:
-                with open(self.trades_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return _json_loads(self.trades_file.read_bytes())
             except:
                 return []
         return []
@@ -114,15 +132,16 @@ class RLOptimizer:
     def _load_config(self) -> Dict:
         if self.config_file.exists():
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return _json_loads(self.config_file.read_bytes())
             except:
                 return {}
         return {}
 
     def _save_config(self, config: Dict):
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2)
+        """寫入策略設定 (先寫暫存檔再原子替換，避免中斷時留下半寫入檔案)"""
+        tmp_file = self.config_file.with_suffix('.tmp')
+        tmp_file.write_bytes(_json_dumps(config))
+        os.replace(tmp_file, self.config_file)
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
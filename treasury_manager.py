@@ -9,11 +9,16 @@
 4. 持久化儲存國庫狀態
 """
 
-import json
 import logging
+import os
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List
+
+import numpy as np
+
+from json_codec import dumps as _json_dumps, loads as _json_loads
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +29,19 @@ class TreasuryManager:
     使用凱利公式 (Kelly Criterion) 計算最佳倉位
     """
     
-    def __init__(self, initial_capital: float = 10000.0, state_file: Path = None):
+    def __init__(self, initial_capital: float = 10000.0, state_file: Path = None, flush_every: int = 1):
+        """
+        Args:
+            flush_every: 每累積幾次狀態變更寫回磁碟一次 (預設 1 = 每次變更即寫回；
+                         大於 1 時結束前需呼叫 flush())
+        """
         self.state_file = state_file or (Path(__file__).parent / "reports" / "treasury_state.json")
         self.state = self._load_state(initial_capital)
+        self.flush_every = max(1, flush_every)
+        self._dirty = False  # 狀態有變更且尚未寫回磁碟
+        self._pending = 0    # 上次寫回後累積的變更次數
+        self._defer = False  # bulk_mode 中延後寫回
+        self._now = datetime.now  # 預先綁定，逐筆交易迴圈中免去模組屬性查找
         
         # Allocation ratios
         self.ALLOCATION = {
@@ -39,8 +54,7 @@ class TreasuryManager:
         """Load treasury state from disk"""
         if self.state_file.exists():
             try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return _json_loads(self.state_file.read_bytes())
             except:
                 pass
         
@@ -60,10 +74,46 @@ class TreasuryManager:
         }
     
     def _save_state(self):
-        """Persist treasury state to disk"""
-        self.state['updated_at'] = datetime.now().isoformat()
-        with open(self.state_file, 'w', encoding='utf-8') as f:
-            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        """Persist treasury state to disk (無變更則略過；先寫暫存檔再原子替換)"""
+        if not self._dirty:
+            return
+        self.state['updated_at'] = self._now().isoformat(timespec='seconds')
+        tmp_file = self.state_file.with_suffix('.tmp')
+        tmp_file.write_bytes(_json_dumps(self.state))
+        os.replace(tmp_file, self.state_file)
+        self._dirty = False
+        self._pending = 0
+    
+    def _maybe_save(self):
+        """依 flush_every 決定是否寫回 (bulk_mode 中一律延後到離開時)"""
+        if not self._dirty or self._defer:
+            return
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self._save_state()
+    
+    def flush(self):
+        """立即寫回尚未儲存的變更"""
+        self._save_state()
+    
+    @contextmanager
+    def bulk_mode(self):
+        """
+        區塊內的交易記錄只更新記憶體，離開時寫回一次
+        
+        Usage:
+            with treasury.bulk_mode():
+                for trade in trades:
+                    treasury.record_trade_result(trade['pnl_usd'], trade['is_win'])
+        """
+        outer = self._defer
+        self._defer = True
+        try:
+            yield self
+        finally:
+            self._defer = outer
+            if not outer:
+                self._save_state()
             
     def calculate_kelly_fraction(self, win_rate: float, avg_win_pct: float, avg_loss_pct: float) -> float:
         """
@@ -74,7 +124,11 @@ class TreasuryManager:
             q = probability of losing (1 - p)
         
         Returns: Optimal fraction of capital to bet (0 to 1)
+        傳入陣列時改走 calculate_kelly_fractions 批次計算
         """
+        if np.ndim(win_rate) or np.ndim(avg_win_pct) or np.ndim(avg_loss_pct):
+            return self.calculate_kelly_fractions(win_rate, avg_win_pct, avg_loss_pct)
+        
         if avg_loss_pct == 0 or win_rate <= 0 or avg_win_pct <= 0:
             return 0.05  # Default 5% if no data
             
@@ -90,6 +144,27 @@ class TreasuryManager:
         # Clamp to 0.02 - 0.20 (2% to 20% of capital)
         return max(0.02, min(0.20, kelly))
     
+    @staticmethod
+    def calculate_kelly_fractions(win_rates, avg_win_pcts, avg_loss_pcts) -> np.ndarray:
+        """
+        批次凱利公式 (回測掃描大量策略參數用)
+        與 calculate_kelly_fraction 相同規則: 無效輸入回傳 5%，否則 Half-Kelly 並限制於 2% - 20%
+        
+        Returns: 與輸入同形狀的倉位比例陣列
+        """
+        p, avg_win, avg_loss = np.broadcast_arrays(
+            np.asarray(win_rates, dtype=np.float64),
+            np.asarray(avg_win_pcts, dtype=np.float64),
+            np.asarray(avg_loss_pcts, dtype=np.float64),
+        )
+        invalid = (avg_loss == 0) | (p <= 0) | (avg_win <= 0)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            b = avg_win / np.abs(avg_loss)
+            kelly = (b * p - (1 - p)) / b / 2
+        
+        return np.where(invalid, 0.05, np.clip(kelly, 0.02, 0.20))
+    
     def get_position_size(self, confidence: int = 80) -> Dict:
         """
         根據當前資本和凱利公式，計算建議的單筆倉位大小
@@ -130,6 +205,22 @@ class TreasuryManager:
     
     def record_trade_result(self, pnl_usd: float, is_win: bool):
         """Record a closed trade result and update treasury"""
+        self._apply_trade(pnl_usd, is_win)
+        self._maybe_save()
+    
+    def bulk_record(self, trades: Iterable[Dict]):
+        """
+        批次記錄多筆已平倉交易，只在最後寫回一次
+        
+        Args:
+            trades: [{pnl_usd, is_win}, ...] (與 PaperTrader closed_trades 格式相同)
+        """
+        with self.bulk_mode():
+            for trade in trades:
+                self._apply_trade(trade['pnl_usd'], trade['is_win'])
+    
+    def _apply_trade(self, pnl_usd: float, is_win: bool):
+        """將單筆交易結果套用到記憶體中的國庫狀態 (不寫檔)"""
         self.state['total_trades'] += 1
         
         if is_win:
@@ -154,12 +245,14 @@ class TreasuryManager:
             # Loss comes from trading capital
             self.state['current_capital'] += pnl_usd  # pnl_usd is negative
             
-        self._save_state()
+        self._dirty = True
         
     def update_unrealized(self, unrealized_pnl: float):
         """Update unrealized PnL for reporting"""
-        self.state['unrealized_pnl'] = unrealized_pnl
-        self._save_state()
+        if self.state['unrealized_pnl'] != unrealized_pnl:
+            self.state['unrealized_pnl'] = unrealized_pnl
+            self._dirty = True
+        self._maybe_save()
         
     def get_summary(self) -> Dict:
         """Get treasury summary for reporting"""
@@ -1,6 +1,6 @@
 
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +15,8 @@ class YieldFarmer:
     """
     
     def __init__(self):
+        self._sorted_pools: Optional[List[Dict]] = None  # 依 APY 排序的快取 (best_pools 變更時失效)
+        
         # Mock Yield Data (In production, this would be fetched from DefiLlama API)
         self.best_pools = [
             {"protocol": "AAVE V3", "chain": "Arbitrum", "asset": "USDC", "apy": 4.5, "tvl": "120M"},
@@ -23,13 +25,31 @@ class YieldFarmer:
             {"protocol": "Radiant", "chain": "BSC", "asset": "USDT", "apy": 6.5, "tvl": "45M"}
         ]
         
+    @property
+    def best_pools(self) -> List[Dict]:
+        return self._best_pools
+    
+    @best_pools.setter
+    def best_pools(self, pools: List[Dict]):
+        # 例如改接 DefiLlama 即時資料時整批替換
+        self._best_pools = pools
+        self._invalidate()
+    
+    def _invalidate(self):
+        """池子清單被就地修改後呼叫，使排序快取失效"""
+        self._sorted_pools = None
+    
+    def _ranked_pools(self) -> List[Dict]:
+        if self._sorted_pools is None:
+            # Sort by APY descending
+            self._sorted_pools = sorted(self._best_pools, key=lambda x: x['apy'], reverse=True)
+        return self._sorted_pools
+    
     def scan_yields(self) -> List[Dict]:
         """
         Return the top yield opportunities
         """
-        # Sort by APY descending
-        sorted_pools = sorted(self.best_pools, key=lambda x: x['apy'], reverse=True)
-        return sorted_pools
+        return list(self._ranked_pools())
 
     def optimize_idle_capital(self, active_positions_count: int) -> Dict[str, Any]:
         """
@@ -52,7 +72,7 @@ class YieldFarmer:
             status = "MINIMAL_FARMING (10%)"
             
         # Get top pick
-        top_pool = self.scan_yields()[0]
+        top_pool = self._ranked_pools()[0]
         
         logger.info(f"🌾 V7 Yield Farmer: Idle Capital Allocation = {status}. Best Pool: {top_pool['protocol']} ({top_pool['apy']}%)")
         